@@ -0,0 +1,274 @@
+from collections import namedtuple
+from functools import lru_cache
+from array import array
+import mmap
+import sys
+
+import gmp_cache
+
+# The block store is the map in the same layout of the UMAP chunk: 8 z levels of
+# 256x256 blocks of 12 bytes each, with x changing fastest. It's read from the UMAP
+# chunk or decoded from the compressed DMAP/CMAP chunks.
+
+BLOCK_INFO_SIZE = 12
+LAYER_INFO_SIZE = 256*256*BLOCK_INFO_SIZE     # one z level of UMAP
+MAP_LEVELS = 8
+UMAP_SIZE = MAP_LEVELS*LAYER_INFO_SIZE
+
+# decoded block fields, see 'decode_block'
+Block = namedtuple("Block", ["left", "right", "top", "bottom", "lid", "green_arrows", "red_arrows", "block_type", "slope_type"])
+Side = namedtuple("Side", ["tile", "wall", "bullet_wall", "flat", "flip", "rotation"])
+Lid = namedtuple("Lid", ["tile", "lighting", "flat", "flip", "rotation"])
+
+DECODED_BLOCKS_CACHE_SIZE = 65536
+
+DMAP_TYPECODE = 'I' if array('I').itemsize == 4 else 'L'     # UInt32
+CMAP_TYPECODE = 'H'                                          # UInt16
+
+def get_map_chunk_name(chunk_infos):
+    """Get the chunk with the map blocks: "UMAP" if the map is uncompressed, else
+    "DMAP" or "CMAP". Returns None if the file has no map blocks at all."""
+    for chunk_name in ["UMAP", "DMAP", "CMAP"]:
+        if chunk_infos[chunk_name][0] is not None:
+            return chunk_name
+    return None
+
+def read_words(map_data, offset, num_words, typecode):
+    """Read 'num_words' little endian words starting at 'offset'.
+    Returns the words and the offset after them."""
+    words = array(typecode)
+    words.frombytes(map_data[offset : offset + num_words*words.itemsize])
+    if sys.byteorder == 'big':
+        words.byteswap()
+    return words, offset + num_words*words.itemsize
+
+def check_column(columns, column_offset, num_blocks):
+    """Get the error message of a column of a compressed map which doesn't fit in the
+    column words or has blocks out of the block list, None if it's right"""
+    if column_offset >= len(columns):
+        return f"offset {column_offset} out of the {len(columns)} column words"
+    first_word = columns[column_offset]
+    height = first_word % 256
+    first_level = (first_word >> 8) % 256
+    if not first_level <= height <= MAP_LEVELS:
+        return f"z levels {first_level} to {height} out of 0 to {MAP_LEVELS}"
+    if column_offset + 1 + height - first_level > len(columns):
+        return f"{height - first_level} blocks after offset {column_offset} out of the {len(columns)} column words"
+    for block_idx in columns[column_offset + 1 : column_offset + 1 + height - first_level]:
+        if block_idx >= num_blocks:
+            return f"block {block_idx} out of the {num_blocks} blocks"
+    return None
+
+def decode_compressed_map(map_data, typecode):
+    """Expand the DMAP (32 bits words) or CMAP (16 bits words) data in a block store.
+
+    Both have the same layout:
+        base[256][256]              offset of the column of each (x, y) in 'columns'
+        column_words
+        columns[column_words]       each column: height, offset, then the index of the
+                                    block of each z level from 'offset' to 'height' - 1
+        num_blocks
+        block[num_blocks]           12 bytes each, same as UMAP
+    """
+    base, offset = read_words(map_data, 0, 256*256, typecode)
+
+    column_words, offset = read_words(map_data, offset, 1, typecode)
+    if len(base) != 256*256 or len(column_words) != 1:
+        print("Error: compressed map is truncated (no column data).")
+        return None
+    columns, offset = read_words(map_data, offset, column_words[0], typecode)
+
+    num_blocks, offset = read_words(map_data, offset, 1, typecode)
+    if len(columns) != column_words[0] or len(num_blocks) != 1:
+        print(f"Error: compressed map is truncated ({len(columns)} column words instead of {column_words[0]}).")
+        return None
+    blocks = bytes(map_data[offset : offset + num_blocks[0]*BLOCK_INFO_SIZE])
+
+    if len(blocks) != num_blocks[0]*BLOCK_INFO_SIZE:
+        print(f"Error: compressed map is truncated ({len(blocks)} bytes of blocks instead of {num_blocks[0]*BLOCK_INFO_SIZE}).")
+        return None
+
+    block_store = bytearray(UMAP_SIZE)
+
+    decoded_columns = dict()    # many (x, y) positions share the same column
+
+    for xy_idx, column_offset in enumerate(base):
+
+        column = decoded_columns.get(column_offset)
+        if column is None:
+            error = check_column(columns, column_offset, num_blocks[0])
+            if error is not None:
+                print(f"Error: wrong compressed map, column of x = {xy_idx % 256}, y = {xy_idx // 256}: {error}.")
+                return None
+            first_word = columns[column_offset]
+            height = first_word % 256
+            first_level = (first_word >> 8) % 256
+            block_indexes = columns[column_offset + 1 : column_offset + 1 + height - first_level]
+            column = [ (z*LAYER_INFO_SIZE, blocks[block_idx*BLOCK_INFO_SIZE : (block_idx + 1)*BLOCK_INFO_SIZE])
+                      for z, block_idx in enumerate(block_indexes, start=first_level) ]
+            decoded_columns[column_offset] = column
+
+        xy_offset = xy_idx*BLOCK_INFO_SIZE
+        for layer_offset, block_data in column:
+            block_store[layer_offset + xy_offset : layer_offset + xy_offset + BLOCK_INFO_SIZE] = block_data
+
+    assert len(block_store) == UMAP_SIZE
+    return block_store
+
+def decode_dmap(dmap_data):
+    return decode_compressed_map(dmap_data, DMAP_TYPECODE)
+
+def decode_cmap(cmap_data):
+    return decode_compressed_map(cmap_data, CMAP_TYPECODE)
+
+def read_block_store(gmp_path, chunk_infos):
+    """Read the whole map as a block store (see top of file), as bytes. The decompressed
+    maps are kept in the cache (see 'gmp_cache'), to skip the decompression next time."""
+    chunk_name = get_map_chunk_name(chunk_infos)
+    if chunk_name is None:
+        return None
+
+    offset, size = chunk_infos[chunk_name]
+    with open(gmp_path, 'rb') as file:
+        file.seek(offset)
+        map_data = file.read(size)
+
+    if chunk_name == "UMAP":
+        return map_data
+
+    cache_key = gmp_cache.get_cache_key(chunk_name, map_data)
+    block_store = gmp_cache.read_cached_block_store(cache_key, UMAP_SIZE)
+    if block_store is not None:
+        print(f"Decompressed {chunk_name} info found in cache.")
+        return block_store
+
+    print(f"Decompressing {chunk_name} info...")
+    if chunk_name == "DMAP":
+        block_store = decode_dmap(map_data)
+    else:
+        block_store = decode_cmap(map_data)
+
+    if block_store is None:
+        return None
+    gmp_cache.write_cached_block_store(cache_key, block_store)
+    return bytes(block_store)
+
+def read_umap_layers(gmp_path, chunk_infos):
+    """Get the map blocks one z level at a time.
+
+    Uncompressed maps are read level by level from the file. Compressed maps are
+    decoded first.
+    """
+    if get_map_chunk_name(chunk_infos) != "UMAP":
+        block_store = read_block_store(gmp_path, chunk_infos)
+        if block_store is None:
+            return None
+        return [ bytes(block_store[offset : offset + LAYER_INFO_SIZE]) for offset in range(0, UMAP_SIZE, LAYER_INFO_SIZE) ]
+    return read_uncompressed_layers(gmp_path, chunk_infos)
+
+def read_uncompressed_layers(gmp_path, chunk_infos):
+    umap_offset = chunk_infos["UMAP"][0]
+    size = chunk_infos["UMAP"][1]
+
+    with open(gmp_path, 'rb') as file:
+        file.seek(umap_offset)
+        for _ in range(size // LAYER_INFO_SIZE):
+            yield file.read(LAYER_INFO_SIZE)
+
+################ random access
+
+def decode_side(side_word):
+    return Side(side_word % 1024, (side_word >> 10) % 2, (side_word >> 11) % 2, (side_word >> 12) % 2, (side_word >> 13) % 2, side_word >> 14)
+
+def decode_lid(lid_word):
+    return Lid(lid_word % 1024, (lid_word >> 10) % 4, (lid_word >> 12) % 2, (lid_word >> 13) % 2, lid_word >> 14)
+
+@lru_cache(maxsize=DECODED_BLOCKS_CACHE_SIZE)
+def decode_block(block_data):
+    """Decode the 12 bytes of a block. The same blocks repeat a lot in a map, so the
+    decoded blocks are cached. The rotations are 0-3 (x 90°)."""
+    words = [ int.from_bytes(block_data[i : i + 2], 'little') for i in range(0, 10, 2) ]
+    arrows = block_data[10]
+    slope_byte = block_data[11]
+    return Block(decode_side(words[0]),
+                 decode_side(words[1]),
+                 decode_side(words[2]),
+                 decode_side(words[3]),
+                 decode_lid(words[4]),
+                 arrows % 16,
+                 arrows // 16,
+                 slope_byte % 4,
+                 slope_byte >> 2)
+
+class MapReader:
+    """Random access to the blocks of a map, without reading the file again for each block.
+
+    Uncompressed maps are memory-mapped (or loaded, if 'use_mmap' is False), compressed
+    maps are decoded once. Use it in a 'with' block or call 'close' when done.
+    """
+
+    def __init__(self, gmp_path, chunk_infos, use_mmap=True):
+        self.file = None
+        self.map_file = None
+
+        chunk_name = get_map_chunk_name(chunk_infos)
+        if chunk_name is None:
+            raise ValueError(f"{gmp_path} has no block data (UMAP, DMAP or CMAP)")
+
+        if chunk_name == "UMAP" and use_mmap:
+            offset, size = chunk_infos["UMAP"]
+            self.file = open(gmp_path, 'rb')
+            self.map_file = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.block_store = memoryview(self.map_file)[offset : offset + size]
+        else:
+            block_store = read_block_store(gmp_path, chunk_infos)
+            if block_store is None:
+                raise ValueError(f"{gmp_path}: the {chunk_name} chunk can't be decoded")
+            self.block_store = memoryview(block_store)
+
+        if len(self.block_store) < UMAP_SIZE:
+            size = len(self.block_store)
+            self.close()
+            raise ValueError(f"{gmp_path} has {size} bytes of blocks instead of {UMAP_SIZE}")
+
+    def close(self):
+        self.block_store.release()
+        if self.map_file is not None:
+            self.map_file.close()
+            self.file.close()
+            self.map_file = None
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_block_data(self, x, y, z):
+        """Get the 12 bytes of the block at (x, y, z)"""
+        if not (0 <= x <= 255 and 0 <= y <= 255 and 0 <= z < MAP_LEVELS):
+            raise IndexError(f"block ({x}, {y}, {z}) out of the map")
+        offset = (x + y*256 + z*256*256)*BLOCK_INFO_SIZE
+        return bytes(self.block_store[offset : offset + BLOCK_INFO_SIZE])
+
+    def block_at(self, x, y, z):
+        """Get the decoded block at (x, y, z)"""
+        return decode_block(self.get_block_data(x, y, z))
+
+    def column(self, x, y):
+        """Get the decoded blocks of every z level at (x, y), from the ground up"""
+        return [ self.block_at(x, y, z) for z in range(MAP_LEVELS) ]
+
+    def region(self, x0, y0, x1, y1, z):
+        """Get the decoded blocks of the rectangle (x0, y0) - (x1, y1) (both included) of
+        the z level, as a list of rows"""
+        if not (0 <= x0 <= x1 <= 255 and 0 <= y0 <= y1 <= 255 and 0 <= z < MAP_LEVELS):
+            raise IndexError(f"region ({x0}, {y0}) - ({x1}, {y1}), z = {z} out of the map")
+
+        rows = []
+        for y in range(y0, y1 + 1):
+            row_offset = (x0 + y*256 + z*256*256)*BLOCK_INFO_SIZE
+            row_data = bytes(self.block_store[row_offset : row_offset + (x1 - x0 + 1)*BLOCK_INFO_SIZE])
+            rows.append([ decode_block(row_data[offset : offset + BLOCK_INFO_SIZE]) for offset in range(0, len(row_data), BLOCK_INFO_SIZE) ])
+        return rows
@@ -0,0 +1,225 @@
+from functools import lru_cache
+from pathlib import Path
+import hashlib
+import shutil
+import os
+
+# Decoded block stores of the compressed maps (DMAP/CMAP), so the same map is only
+# decompressed once. Each entry is the raw block store (same layout as UMAP) in a file
+# named after the sha256 of the compressed chunk, so it can be read (or memory-mapped)
+# as it is. Reading an entry updates its modification time, and the oldest entries are
+# removed when the cache grows over its maximum size.
+#
+# The output cache keeps the maps written by the transforms, named after the sha256 of
+# the engine version, the source file and the transform, followed by the sha256 of the
+# output itself. A cached output is hard-linked (or copied, if the file system can't) to
+# its destination instead of computed again. An output edited in place also changes its
+# cached entry, so the content of an entry is checked against its name before it's used.
+#
+# GMP_CACHE_DIR sets the folder of the caches (default: "gmp_cache" in the folder of
+# the rotator), GMP_CACHE_SIZE and GMP_OUTPUT_CACHE_SIZE their maximum size in MB (0
+# turns a cache off).
+
+def get_size_setting(name, default):
+    """Get the size in MB of the environment variable 'name' in bytes, or the default
+    if it isn't set or isn't a number"""
+    value = os.environ.get(name)
+    if value is not None:
+        try:
+            return int(value)*1024*1024
+        except ValueError:
+            print(f"Warning: {name} = '{value}' isn't a size in MB, using {default} MB.")
+    return default*1024*1024
+
+CACHE_DIR = Path(os.environ.get("GMP_CACHE_DIR", Path(__file__).parent / "gmp_cache"))
+CACHE_MAX_SIZE = get_size_setting("GMP_CACHE_SIZE", 256)
+CACHE_SUFFIX = ".umap"
+
+OUTPUT_CACHE_DIR = CACHE_DIR / "outputs"
+OUTPUT_CACHE_MAX_SIZE = get_size_setting("GMP_OUTPUT_CACHE_SIZE", 1024)
+OUTPUT_CACHE_SUFFIX = ".gmp"
+
+HASH_BUFFER_SIZE = 1024*1024
+
+def is_cache_enabled():
+    return CACHE_MAX_SIZE > 0
+
+def get_cache_key(chunk_name, chunk_data):
+    sha256 = hashlib.sha256(chunk_name.encode('ascii'))
+    sha256.update(chunk_data)
+    return sha256.hexdigest()
+
+def get_cache_path(key):
+    return CACHE_DIR / f"{key}{CACHE_SUFFIX}"
+
+def read_cached_block_store(key, size):
+    """Get the cached block store of 'key', or None if not cached (or not 'size' bytes)"""
+    if not is_cache_enabled():
+        return None
+
+    cache_path = get_cache_path(key)
+    try:
+        with open(cache_path, 'rb') as file:
+            block_store = file.read()
+    except OSError:
+        return None
+
+    if len(block_store) != size:
+        remove_entry(cache_path)
+        return None
+
+    try:
+        os.utime(cache_path)    # most recently used
+    except OSError:
+        pass
+    return block_store
+
+def write_cached_block_store(key, block_store):
+    """Add a block store to the cache, then remove the least recently used entries if
+    the cache is too big. The cache is optional: any error only skips it."""
+    if not is_cache_enabled() or len(block_store) > CACHE_MAX_SIZE:
+        return
+
+    cache_path = get_cache_path(key)
+    temp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(temp_path, 'wb') as file:
+            file.write(block_store)
+        os.replace(temp_path, cache_path)   # other processes never see a partial entry
+    except OSError:
+        remove_entry(temp_path)
+        return
+
+    evict_entries(CACHE_MAX_SIZE)
+    return
+
+def remove_entry(cache_path):
+    try:
+        os.remove(cache_path)
+    except OSError:
+        pass
+
+def get_cache_entries(cache_dir=CACHE_DIR, suffix=CACHE_SUFFIX):
+    """Get the (modification time, size, path) of each entry, least recently used first"""
+    entries = []
+    try:
+        cache_paths = list(cache_dir.glob(f"*{suffix}"))
+    except OSError:
+        return entries
+
+    for cache_path in cache_paths:
+        try:
+            stat = cache_path.stat()
+        except OSError:
+            continue    # removed by another process
+        entries.append((stat.st_mtime, stat.st_size, cache_path))
+    entries.sort()
+    return entries
+
+def evict_entries(max_size, cache_dir=CACHE_DIR, suffix=CACHE_SUFFIX):
+    """Remove the least recently used entries until the cache takes up to 'max_size' bytes"""
+    entries = get_cache_entries(cache_dir, suffix)
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, cache_path in entries:
+        if total_size <= max_size:
+            break
+        remove_entry(cache_path)
+        total_size -= size
+    return
+
+def clear_cache():
+    evict_entries(0)
+    evict_entries(0, OUTPUT_CACHE_DIR, OUTPUT_CACHE_SUFFIX)
+
+################ output cache
+
+def is_output_cache_enabled():
+    return OUTPUT_CACHE_MAX_SIZE > 0
+
+@lru_cache(maxsize=None)
+def get_engine_version():
+    """Hash of the modules of the rotator: any change of the code gives new output keys"""
+    sha256 = hashlib.sha256()
+    for module_path in sorted(Path(__file__).parent.glob("*.py")):
+        sha256.update(module_path.name.encode('utf-8'))
+        sha256.update(module_path.read_bytes())
+    return sha256.hexdigest()
+
+def hash_file(sha256, file_path):
+    with open(file_path, 'rb') as file:
+        while data := file.read(HASH_BUFFER_SIZE):
+            sha256.update(data)
+    return sha256
+
+def get_output_key(gmp_path, transform):
+    """Get the key of the output of 'transform' (any value with a stable repr, e.g. the
+    steps of a symmetry and its options) applied to the map file"""
+    sha256 = hash_file(hashlib.sha256(get_engine_version().encode('ascii')), gmp_path)
+    sha256.update(repr(transform).encode('utf-8'))
+    return sha256.hexdigest()
+
+def get_output_cache_path(key, content_hash):
+    return OUTPUT_CACHE_DIR / f"{key}_{content_hash}{OUTPUT_CACHE_SUFFIX}"
+
+def find_cached_output(key):
+    """Get the path of the cached output of 'key', or None if not cached. The entries
+    whose content changed since they were cached are removed."""
+    try:
+        cache_paths = list(OUTPUT_CACHE_DIR.glob(f"{key}_*{OUTPUT_CACHE_SUFFIX}"))
+    except OSError:
+        return None
+
+    for cache_path in cache_paths:
+        content_hash = cache_path.name[len(key) + 1 : -len(OUTPUT_CACHE_SUFFIX)]
+        try:
+            is_valid = (hash_file(hashlib.sha256(), cache_path).hexdigest() == content_hash)
+        except OSError:
+            continue    # removed by another process
+        if is_valid:
+            return cache_path
+        remove_entry(cache_path)    # e.g. a linked output edited in place
+    return None
+
+def link_file(source_path, output_path):
+    """Hard link (or copy) a file, replacing 'output_path' at once"""
+    if Path(output_path).exists() and os.path.samefile(source_path, output_path):
+        return      # already linked
+    temp_path = Path(output_path).with_name(f"{Path(output_path).name}.{os.getpid()}.tmp")
+    remove_entry(temp_path)
+    try:
+        os.link(source_path, temp_path)
+    except OSError:
+        shutil.copyfile(source_path, temp_path)     # e.g. another file system
+    os.replace(temp_path, output_path)
+
+def link_cached_output(key, output_path):
+    """Place the cached output of 'key' at 'output_path'. Returns False if not cached."""
+    if not is_output_cache_enabled():
+        return False
+
+    cache_path = find_cached_output(key)
+    if cache_path is None:
+        return False
+    try:
+        link_file(cache_path, output_path)
+        os.utime(cache_path)    # most recently used
+    except OSError:
+        return False
+    return True
+
+def add_cached_output(key, output_path):
+    """Add a written output to the cache, then remove the least recently used outputs if
+    the cache is too big. Any error only skips the cache."""
+    if not is_output_cache_enabled():
+        return
+
+    try:
+        OUTPUT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        content_hash = hash_file(hashlib.sha256(), output_path).hexdigest()
+        link_file(output_path, get_output_cache_path(key, content_hash))
+    except OSError:
+        return
+
+    evict_entries(OUTPUT_CACHE_MAX_SIZE, OUTPUT_CACHE_DIR, OUTPUT_CACHE_SUFFIX)
+    return
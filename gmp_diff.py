@@ -0,0 +1,215 @@
+from pathlib import Path
+import argparse
+import sys
+import os
+
+import rotate_gmp
+import gmp_blocks
+import gmp_engine
+
+PROGRAM_NAME = os.path.basename(sys.argv[0])
+
+LAYER_INFO_SIZE = gmp_blocks.LAYER_INFO_SIZE
+
+# chunks compared record by record, the other ones are compared as a whole
+MAP_CHUNKS = ["UMAP", "DMAP", "CMAP", "ZONE", "LGHT", "MOBJ"]
+
+def get_changed_blocks(layer_data_1, layer_data_2):
+    """Get the index (y*256 + x) of every block that differs between two z levels"""
+    return gmp_engine.get_different_blocks(layer_data_1, layer_data_2, 256*256)
+
+def group_in_boxes(block_indexes):
+    """Group the neighbouring blocks (including diagonals) of a z level in bounding boxes.
+
+    Returns a list of [min_x, min_y, max_x, max_y, number of blocks].
+    """
+    pending_blocks = set(block_indexes)
+    boxes = []
+
+    while pending_blocks:
+        start = pending_blocks.pop()
+        box = [start % 256, start // 256, start % 256, start // 256, 0]
+        pending = [start]
+
+        while pending:
+            idx = pending.pop()
+            x = idx % 256
+            y = idx // 256
+            box[0] = min(box[0], x)
+            box[1] = min(box[1], y)
+            box[2] = max(box[2], x)
+            box[3] = max(box[3], y)
+            box[4] += 1
+
+            for neighbour_y in range(max(y - 1, 0), min(y + 2, 256)):
+                for neighbour_x in range(max(x - 1, 0), min(x + 2, 256)):
+                    neighbour = neighbour_y*256 + neighbour_x
+                    if neighbour in pending_blocks:
+                        pending_blocks.remove(neighbour)
+                        pending.append(neighbour)
+
+        boxes.append(box)
+
+    boxes.sort(key=lambda box: (box[1], box[0]))
+    return boxes
+
+def diff_blocks(block_store_1, block_store_2):
+    """Compare the blocks of both maps level by level.
+
+    Returns a list of (z, boxes) for the levels with changes, see 'group_in_boxes'.
+    """
+    changes = []
+    for offset in range(0, gmp_blocks.UMAP_SIZE, LAYER_INFO_SIZE):
+        layer_data_1 = block_store_1[offset : offset + LAYER_INFO_SIZE]
+        layer_data_2 = block_store_2[offset : offset + LAYER_INFO_SIZE]
+        changed_blocks = get_changed_blocks(layer_data_1, layer_data_2)
+        if changed_blocks:
+            changes.append((offset // LAYER_INFO_SIZE, group_in_boxes(changed_blocks)))
+    return changes
+
+def group_zones_by_name(zones):
+    """Get the list of zones of each name, in the order of the map"""
+    zones_by_name = dict()
+    for zone_data in zones or []:
+        zones_by_name.setdefault(rotate_gmp.get_zone_name(zone_data), []).append(zone_data)
+    return zones_by_name
+
+def diff_zones(zones_1, zones_2):
+    """Compare the zones of both maps by name. Zones can share a name: the same zones
+    (name, type and rectangle) are matched first, then the others in order."""
+    messages = []
+    zones_by_name_1 = group_zones_by_name(zones_1)
+    zones_by_name_2 = group_zones_by_name(zones_2)
+
+    zone_names = list(zones_by_name_1) + [ zone_name for zone_name in zones_by_name_2 if zone_name not in zones_by_name_1 ]
+    for zone_name in zone_names:
+        old_zones = zones_by_name_1.get(zone_name, [])
+        new_zones = list(zones_by_name_2.get(zone_name, []))
+
+        changed_zones = []
+        for zone_data in old_zones:
+            if zone_data in new_zones:
+                new_zones.remove(zone_data)
+            else:
+                changed_zones.append(zone_data)
+
+        for zone_data, new_zone_data in zip(changed_zones, new_zones):
+            old_type, old_x, old_y, old_w, old_h = zone_data[:5]
+            new_type, new_x, new_y, new_w, new_h = new_zone_data[:5]
+            messages.append(f"Zone '{zone_name}' changed: type {old_type} -> {new_type}, "
+                            f"(x, y, w, h) = ({old_x}, {old_y}, {old_w}, {old_h}) -> ({new_x}, {new_y}, {new_w}, {new_h})")
+
+        for zone_data in changed_zones[len(new_zones):]:
+            messages.append(f"Zone '{zone_name}' removed: (x, y, w, h) = {tuple(zone_data[1:5])}")
+        for zone_data in new_zones[len(changed_zones):]:
+            messages.append(f"Zone '{zone_name}' added: (x, y, w, h) = {tuple(zone_data[1:5])}")
+
+    return messages
+
+def diff_records(records_1, records_2, record_name):
+    """Compare the lights/objects of both maps by index"""
+    messages = []
+    records_1 = records_1 or []
+    records_2 = records_2 or []
+
+    for i, (record_1, record_2) in enumerate(zip(records_1, records_2)):
+        if record_1 != record_2:
+            messages.append(f"{record_name} {i} changed: {record_1.hex(' ')} -> {record_2.hex(' ')}")
+
+    if len(records_1) > len(records_2):
+        messages.append(f"{len(records_1) - len(records_2)} {record_name.lower()}s removed (from {record_name.lower()} {len(records_2)})")
+    elif len(records_2) > len(records_1):
+        messages.append(f"{len(records_2) - len(records_1)} {record_name.lower()}s added (from {record_name.lower()} {len(records_1)})")
+
+    return messages
+
+def read_chunk(gmp_path, chunk_infos, chunk_name):
+    offset, size = chunk_infos[chunk_name]
+    if offset is None:
+        return None
+    with open(gmp_path, 'rb') as file:
+        file.seek(offset)
+        return file.read(size)
+
+def diff_other_chunks(gmp_path_1, chunk_infos_1, gmp_path_2, chunk_infos_2):
+    """Compare the remaining chunks (e.g. ANIM, RGEN) as a whole"""
+    messages = []
+    for chunk_name in chunk_infos_1:
+        if chunk_name in MAP_CHUNKS:
+            continue
+        chunk_data_1 = read_chunk(gmp_path_1, chunk_infos_1, chunk_name)
+        chunk_data_2 = read_chunk(gmp_path_2, chunk_infos_2, chunk_name)
+        if chunk_data_1 is None and chunk_data_2 is None:
+            continue
+        elif chunk_data_2 is None:
+            messages.append(f"Chunk {chunk_name} removed")
+        elif chunk_data_1 is None:
+            messages.append(f"Chunk {chunk_name} added")
+        elif chunk_data_1 != chunk_data_2:
+            messages.append(f"Chunk {chunk_name} changed ({len(chunk_data_1)} -> {len(chunk_data_2)} bytes)")
+    return messages
+
+def diff_gmp(gmp_path_1, gmp_path_2):
+    """Compare two gmp files.
+
+    Returns the block changes (see 'diff_blocks') and a list of messages for the other
+    changes, or (None, None) if a map has no block data.
+    """
+    chunk_infos_1 = rotate_gmp.detect_headers_and_get_chunks(gmp_path_1)
+    chunk_infos_2 = rotate_gmp.detect_headers_and_get_chunks(gmp_path_2)
+
+    block_store_1 = gmp_blocks.read_block_store(gmp_path_1, chunk_infos_1)
+    block_store_2 = gmp_blocks.read_block_store(gmp_path_2, chunk_infos_2)
+    if block_store_1 is None or block_store_2 is None:
+        return None, None
+
+    block_changes = diff_blocks(block_store_1, block_store_2)
+
+    messages = diff_zones(rotate_gmp.get_zones_info_data(gmp_path_1, chunk_infos_1),
+                          rotate_gmp.get_zones_info_data(gmp_path_2, chunk_infos_2))
+    messages += diff_records(rotate_gmp.get_light_info_data(gmp_path_1, chunk_infos_1),
+                             rotate_gmp.get_light_info_data(gmp_path_2, chunk_infos_2),
+                             "Light")
+    messages += diff_records(rotate_gmp.get_objects_info_data(gmp_path_1, chunk_infos_1),
+                             rotate_gmp.get_objects_info_data(gmp_path_2, chunk_infos_2),
+                             "Object")
+    messages += diff_other_chunks(gmp_path_1, chunk_infos_1, gmp_path_2, chunk_infos_2)
+
+    return block_changes, messages
+
+
+def main():
+    parser = argparse.ArgumentParser(PROGRAM_NAME, description="Show what changed between two maps")
+    parser.add_argument("gmp_path_1")
+    parser.add_argument("gmp_path_2")
+    args = parser.parse_args()
+
+    gmp_path_1 = Path(args.gmp_path_1)
+    gmp_path_2 = Path(args.gmp_path_2)
+    if (not gmp_path_1.exists() or not gmp_path_2.exists()):
+        print("File not found.")
+        sys.exit(-1)
+
+    block_changes, messages = diff_gmp(gmp_path_1, gmp_path_2)
+    if block_changes is None:
+        print("Error: both maps must have block data (UMAP, DMAP or CMAP).")
+        sys.exit(-1)
+
+    print()
+    for z, boxes in block_changes:
+        num_blocks = sum(box[4] for box in boxes)
+        print(f"z = {z}: {num_blocks} blocks changed in {len(boxes)} areas")
+        for min_x, min_y, max_x, max_y, box_blocks in boxes:
+            print(f"  ({min_x}, {min_y}) to ({max_x}, {max_y}): {box_blocks} blocks")
+
+    for message in messages:
+        print(message)
+
+    if not block_changes and not messages:
+        print("The maps are equal.")
+        return
+
+    sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,550 @@
+from pathlib import Path
+import argparse
+import sys
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import rotate_gmp
+import flip_gmp
+import gmp_writer
+import gmp_blocks
+import translate_gmp
+import gmp_plugins
+import gmp_cache
+
+PROGRAM_NAME = os.path.basename(sys.argv[0])
+ROOT_DIR = Path(__file__).parent
+
+BLOCK_INFO_SIZE = rotate_gmp.BLOCK_INFO_SIZE
+LAYER_INFO_SIZE = rotate_gmp.LAYER_INFO_SIZE
+LIGHT_INFO_SIZE = rotate_gmp.LIGHT_INFO_SIZE
+OBJECT_INFO_SIZE = rotate_gmp.OBJECT_INFO_SIZE
+ZONE_TYPE_COORDS_DATA_SIZE = rotate_gmp.ZONE_TYPE_COORDS_DATA_SIZE
+
+ROTATE = 0
+FLIP = 1
+TRANSLATE = 2   # value = (dx, dy, dz) in blocks, see 'translate_gmp'
+PLUGIN = 3      # value = (plugin spec, rectangle or None), see 'gmp_plugins'
+
+# Every symmetry of the map is a sequence of the rotations/flips of 'rotate_gmp' and
+# 'flip_gmp', applied from left to right. The name is used as suffix of the output file.
+SYMMETRIES = {
+    "rotated_90" : ( (ROTATE, 90), ),
+    "rotated_180" : ( (ROTATE, 180), ),
+    "rotated_270" : ( (ROTATE, 270), ),
+    "flip_x" : ( (FLIP, flip_gmp.FLIP_X), ),
+    "flip_y" : ( (FLIP, flip_gmp.FLIP_Y), ),
+    "transpose" : ( (FLIP, flip_gmp.FLIP_X), (ROTATE, 270) ),        # (x, y) -> (y, x)
+    "anti_transpose" : ( (FLIP, flip_gmp.FLIP_X), (ROTATE, 90) ),    # (x, y) -> (255 - y, 255 - x)
+}
+
+# Identities checked by --verify: both sequences of steps must give the same map
+IDENTITIES = [
+    ("rotated_90 4 times = original", ( (ROTATE, 90), )*4, () ),
+    ("flip_x 2 times = original", ( (FLIP, flip_gmp.FLIP_X), )*2, () ),
+    ("flip_y 2 times = original", ( (FLIP, flip_gmp.FLIP_Y), )*2, () ),
+    ("flip_x then flip_y = rotated_180", ( (FLIP, flip_gmp.FLIP_X), (FLIP, flip_gmp.FLIP_Y) ), ( (ROTATE, 180), ) ),
+]
+
+# chunks decoded by the engine
+MAP_CHUNKS = ["UMAP", "ZONE", "LGHT", "MOBJ"]
+
+def get_filename(path):
+    str_path = str(path)
+    i = max(str_path.rfind('\\'), str_path.rfind('/')) + 1
+    j = str_path.rfind('.')
+    return str_path[i:j]
+
+def split_zones_data(zone_chunk):
+    """Split the raw ZONE chunk in a list of zones, same as 'get_zones_info_data'"""
+    zones_data_array = []
+    offset = 0
+    while (offset < len(zone_chunk)):
+        name_length = zone_chunk[offset + ZONE_TYPE_COORDS_DATA_SIZE]
+        zone_size = ZONE_TYPE_COORDS_DATA_SIZE + 1 + name_length
+        zones_data_array.append(bytes(zone_chunk[offset : offset + zone_size]))
+        offset += zone_size
+    return zones_data_array
+
+def split_lights_data(light_chunk):
+    """Split the raw LGHT chunk in a list of lights, same as 'get_light_info_data'"""
+    return [ bytes(light_chunk[i : i + LIGHT_INFO_SIZE]) for i in range(0, len(light_chunk), LIGHT_INFO_SIZE) ]
+
+def split_objects_data(object_chunk):
+    """Split the raw MOBJ chunk in a list of map objects, same as 'get_objects_info_data'"""
+    return [ bytes(object_chunk[i : i + OBJECT_INFO_SIZE]) for i in range(0, len(object_chunk), OBJECT_INFO_SIZE) ]
+
+def get_transform_steps(symmetry_name, translation=None, plugins=None):
+    """Get the steps of the plugins (on the blocks of the source map), then a symmetry
+    (None for no symmetry), then a translation"""
+    steps = tuple( (PLUGIN, plugin) for plugin in plugins or [] )
+    steps += SYMMETRIES[symmetry_name] if symmetry_name is not None else ()
+    if translation is not None:
+        steps += ( (TRANSLATE, tuple(translation)), )
+    return steps
+
+def get_transform_name(symmetry_name, translation=None):
+    """Get the suffix of the output file of a symmetry followed by a translation"""
+    names = [symmetry_name] if symmetry_name is not None else []
+    if translation is not None:
+        names.append("moved_{}_{}_{}".format(*translation))
+    return "_".join(names) if names else "edited"     # plugins only
+
+def get_levels_translation(steps):
+    """Get the total translation of 'steps' along z. The rotations/flips don't change z,
+    so the z levels are moved as a whole, whatever the order of the steps."""
+    return (0, 0, sum(value[2] for step_type, value in steps if step_type == TRANSLATE))
+
+def transform_layer(layer_data, steps, z=None):
+    """Apply the rotations/flips/translations (x and y only) and plugins of 'steps' to a
+    single z level of UMAP. 'z' is the level given to the plugins."""
+    for step_type, value in steps:
+        if step_type == ROTATE:
+            layer_data = rotate_gmp.rotate_layer(layer_data, value)
+        elif step_type == FLIP:
+            layer_data = flip_gmp.flip_layer(layer_data, value)
+        elif step_type == TRANSLATE:
+            layer_data = translate_gmp.translate_layer(layer_data, value[0], value[1])
+            if z is not None:
+                z += value[2]
+        else:
+            layer_data = gmp_plugins.apply_plugin(layer_data, z, value)
+    return layer_data
+
+def transform_levels(map_data, offset, steps):
+    """Apply 'steps' to the 8 z levels of the UMAP data at 'offset' of 'map_data', one
+    level at a time. Each level takes the blocks of the level moved to it, if any."""
+    levels_translation = get_levels_translation(steps)
+    for z in range(gmp_blocks.MAP_LEVELS):
+        source_z = translate_gmp.get_source_level(z, levels_translation)
+        if source_z is None:
+            yield bytes(LAYER_INFO_SIZE)
+            continue
+        layer_offset = offset + source_z*LAYER_INFO_SIZE
+        yield transform_layer(bytes(map_data[layer_offset : layer_offset + LAYER_INFO_SIZE]), steps, source_z)
+
+def get_blocks_boxes(map_data, offset):
+    """Get the bounding box of the blocks of each z level, see 'translate_gmp.get_blocks_box'"""
+    return [ translate_gmp.get_blocks_box(bytes(map_data[layer_offset : layer_offset + LAYER_INFO_SIZE]))
+             for layer_offset in range(offset, offset + gmp_blocks.UMAP_SIZE, LAYER_INFO_SIZE) ]
+
+def validate_blocks(blocks_boxes, steps):
+    """Check that the translations of 'steps' don't move any block out of the map. The
+    bounding box of each z level is moved by every step instead of the blocks themselves.
+
+    Returns a list of error messages, empty if the steps can be applied.
+    """
+    errors = []
+    for z, box in enumerate(blocks_boxes):
+        if box is None:
+            continue
+        for step_type, value in steps:
+            if step_type == ROTATE:
+                box = rotate_gmp.get_rotated_zone_rect((None,) + box, value)
+            elif step_type == FLIP:
+                box = flip_gmp.get_flipped_zone_rect((None,) + box, value)
+            elif step_type == TRANSLATE:
+                error = translate_gmp.validate_blocks_box(box, z, value)
+                if error is not None:
+                    errors.append(error)
+                    break
+                box = translate_gmp.get_translated_box(box, value)
+                z += value[2]
+    return errors
+
+def validate_zones_and_lights(zones_info_array, light_info_array, steps):
+    """Check zones and lights against the map bounds for every step of the symmetry.
+
+    Returns a list of error messages, empty if the symmetry can be applied.
+    """
+    errors = []
+    zones = zones_info_array
+    lights = light_info_array
+
+    for step_type, value in steps:
+        if step_type == ROTATE:
+            errors += rotate_gmp.validate_zones_and_lights(zones, lights, value)
+        elif step_type == FLIP:
+            errors += flip_gmp.validate_zones_and_lights(zones, lights, value)
+        elif step_type == TRANSLATE:
+            errors += translate_gmp.validate_zones_and_lights(zones, lights, value)
+        if errors:
+            break
+        zones, lights = transform_zones_and_lights(zones, lights, [(step_type, value)])
+
+    return errors
+
+def transform_zones_and_lights(zones_info_array, light_info_array, steps):
+    """Apply the rotations/flips/translations of 'steps' to copies of the zones and lights lists"""
+    zones = list(zones_info_array) if zones_info_array is not None else None
+    lights = list(light_info_array) if light_info_array is not None else None
+
+    for step_type, value in steps:
+        if step_type == ROTATE:
+            if zones is not None:
+                rotate_gmp.rotate_zone_info(zones, value)
+            if lights is not None:
+                rotate_gmp.rotate_light_info(lights, value)
+        elif step_type == FLIP:
+            if zones is not None:
+                flip_gmp.flip_zone_info(zones, value)
+            if lights is not None:
+                flip_gmp.flip_light_info(lights, value)
+        elif step_type == TRANSLATE:
+            if zones is not None:
+                translate_gmp.translate_zone_info(zones, value)
+            if lights is not None:
+                translate_gmp.translate_light_info(lights, value)
+
+    return zones, lights
+
+def validate_objects(objects_info_array, steps):
+    """Check the map objects against the map bounds for every step of the symmetry"""
+    errors = []
+    objects = objects_info_array
+
+    for step_type, value in steps:
+        if step_type == ROTATE:
+            errors += rotate_gmp.validate_objects(objects, value)
+        elif step_type == FLIP:
+            errors += flip_gmp.validate_objects(objects, value)
+        elif step_type == TRANSLATE:
+            errors += translate_gmp.validate_objects(objects, value)
+        if errors:
+            break
+        objects = transform_objects(objects, [(step_type, value)])
+
+    return errors
+
+def transform_objects(objects_info_array, steps):
+    """Apply the rotations/flips/translations of 'steps' to a copy of the map objects list"""
+    if objects_info_array is None:
+        return None
+
+    objects = list(objects_info_array)
+    for step_type, value in steps:
+        if step_type == ROTATE:
+            rotate_gmp.rotate_object_info(objects, value)
+        elif step_type == FLIP:
+            flip_gmp.flip_object_info(objects, value)
+        elif step_type == TRANSLATE:
+            translate_gmp.translate_object_info(objects, value)
+
+    return objects
+
+################ verify stuff
+
+def get_different_blocks(layer_data_1, layer_data_2, max_blocks):
+    """Get the index of the first 'max_blocks' blocks that differ between two z levels.
+
+    Whole rows are compared first, so only the differing rows are checked block by block.
+    """
+    different_blocks = []
+    if layer_data_1 == layer_data_2:
+        return different_blocks
+
+    row_size = 256*BLOCK_INFO_SIZE
+    view_1 = memoryview(layer_data_1)
+    view_2 = memoryview(layer_data_2)
+
+    for row_offset in range(0, LAYER_INFO_SIZE, row_size):
+        if view_1[row_offset : row_offset + row_size] == view_2[row_offset : row_offset + row_size]:
+            continue
+        for offset in range(row_offset, row_offset + row_size, BLOCK_INFO_SIZE):
+            if view_1[offset : offset + BLOCK_INFO_SIZE] != view_2[offset : offset + BLOCK_INFO_SIZE]:
+                different_blocks.append(offset // BLOCK_INFO_SIZE)
+                if len(different_blocks) == max_blocks:
+                    return different_blocks
+
+    return different_blocks
+
+def get_different_records(records_1, records_2, max_records):
+    """Get the index of the first 'max_records' zones/lights/objects that differ"""
+    if records_1 is None:
+        return []
+    return [ i for i, (record_1, record_2) in enumerate(zip(records_1, records_2)) if record_1 != record_2 ][:max_records]
+
+def verify_identity(layers, zones, lights, objects, steps_1, steps_2, max_differences):
+    """Apply both sequences of steps to the map in memory and compare the results.
+
+    Returns a list of messages describing the first differences, empty if both are equal.
+    """
+    differences = []
+
+    for z, layer_data in enumerate(layers):
+        different_blocks = get_different_blocks(transform_layer(layer_data, steps_1),
+                                                transform_layer(layer_data, steps_2),
+                                                max_differences - len(differences))
+        for block_idx in different_blocks:
+            differences.append(f"UMAP block x = {block_idx % 256}, y = {block_idx // 256}, z = {z}")
+        if len(differences) >= max_differences:
+            return differences
+
+    zones_1, lights_1 = transform_zones_and_lights(zones, lights, steps_1)
+    zones_2, lights_2 = transform_zones_and_lights(zones, lights, steps_2)
+    objects_1 = transform_objects(objects, steps_1)
+    objects_2 = transform_objects(objects, steps_2)
+
+    for chunk_name, records_1, records_2 in (("ZONE", zones_1, zones_2), ("LGHT", lights_1, lights_2), ("MOBJ", objects_1, objects_2)):
+        for i in get_different_records(records_1, records_2, max_differences):
+            differences.append(f"{chunk_name} record {i}")
+
+    return differences[:max_differences]
+
+def verify_identities(gmp_path, chunk_infos, max_differences=5):
+    """Check the IDENTITIES on the map, fully in memory (no file is written).
+
+    Returns the number of identities that don't hold.
+    """
+    layers = gmp_blocks.read_umap_layers(gmp_path, chunk_infos)
+    if layers is None:
+        print("Error: the map has no block data (UMAP, DMAP or CMAP).")
+        return -2
+    layers = list(layers)
+
+    zones = rotate_gmp.get_zones_info_data(gmp_path, chunk_infos)
+    lights = rotate_gmp.get_light_info_data(gmp_path, chunk_infos)
+    objects = rotate_gmp.get_objects_info_data(gmp_path, chunk_infos)
+
+    num_failed = 0
+    for identity_name, steps_1, steps_2 in IDENTITIES:
+        errors = ( validate_zones_and_lights(zones, lights, steps_1 + steps_2)
+                   + validate_objects(objects, steps_1 + steps_2) )
+        if errors:
+            print(f"SKIPPED  {identity_name}: zones/lights/objects out of the map")
+            continue
+
+        differences = verify_identity(layers, zones, lights, objects, steps_1, steps_2, max_differences)
+        if differences:
+            num_failed += 1
+            print(f"FAILED   {identity_name}, first differences:")
+            for difference in differences:
+                print(f"  {difference}")
+        else:
+            print(f"OK       {identity_name}")
+
+    return num_failed
+
+################ shared memory stuff
+
+def load_map_to_shared_memory(gmp_path, chunk_infos):
+    """Read UMAP, ZONE and LGHT once and place them in a single shared memory block.
+    Compressed maps (DMAP, CMAP) are decoded and placed as UMAP.
+
+    Returns the shared memory and a dict with the (offset, size) of each chunk inside it.
+    """
+    block_store = None
+    if gmp_blocks.get_map_chunk_name(chunk_infos) != "UMAP":
+        block_store = gmp_blocks.read_block_store(gmp_path, chunk_infos)
+        if block_store is None:
+            return None, None
+
+    layout = dict()
+    total_size = 0
+    for chunk_name in MAP_CHUNKS:
+        if chunk_name == "UMAP" and block_store is not None:
+            size = len(block_store)
+        elif chunk_infos[chunk_name][0] is not None:
+            size = chunk_infos[chunk_name][1]
+        else:
+            continue
+        layout[chunk_name] = (total_size, size)
+        total_size += size
+
+    shm = shared_memory.SharedMemory(create=True, size=max(total_size, 1))
+
+    with open(gmp_path, 'rb') as file:
+        for chunk_name, (offset, size) in layout.items():
+            if chunk_name == "UMAP" and block_store is not None:
+                shm.buf[offset : offset + size] = block_store
+                continue
+            file.seek(chunk_infos[chunk_name][0])
+            file.readinto(shm.buf[offset : offset + size])
+
+    return shm, layout
+
+def write_symmetry_from_shared_memory(shm_name, layout, gmp_path, chunk_infos, map_chunk, steps, output_path):
+    """Worker: attach to the decoded map, compute one symmetry (its steps) and write its output file.
+    Returns the output path, or None if it wasn't written."""
+    shm = shared_memory.SharedMemory(name=shm_name)     # attach, the parent process unlinks it
+    try:
+        new_chunks = dict()
+
+        if "UMAP" in layout:
+            offset, size = layout["UMAP"]
+            new_chunks[map_chunk] = transform_levels(shm.buf, offset, steps)
+
+        zones = None
+        lights = None
+        if "ZONE" in layout:
+            offset, size = layout["ZONE"]
+            zones = split_zones_data(shm.buf[offset : offset + size])
+        if "LGHT" in layout:
+            offset, size = layout["LGHT"]
+            lights = split_lights_data(shm.buf[offset : offset + size])
+
+        zones, lights = transform_zones_and_lights(zones, lights, steps)
+
+        if "MOBJ" in layout:
+            offset, size = layout["MOBJ"]
+            new_chunks["MOBJ"] = transform_objects(split_objects_data(shm.buf[offset : offset + size]), steps)
+
+        if zones is not None:
+            new_chunks["ZONE"] = zones
+        if lights is not None:
+            new_chunks["LGHT"] = lights
+
+        # the decoded map is written uncompressed, in place of the compressed chunk
+        # (if a plugin fails while its levels are written, no partial output is left)
+        if gmp_writer.write_gmp(gmp_path, output_path, chunk_infos, new_chunks, {map_chunk: "UMAP"}) != 0:
+            return None
+    finally:
+        shm.close()
+
+    return str(output_path)
+
+def fan_out_symmetries(gmp_path, chunk_infos, symmetry_names, out_path, num_workers=None, translation=None, plugins=None):
+    """Decode the map once and write one output file per symmetry, each one computed
+    by a different worker process attached to the same shared memory.
+
+    With a translation (dx, dy, dz), every symmetry is followed by it. A symmetry name
+    can be None to only translate the map. The plugins (spec, rectangle or None) change
+    the blocks of each z level before the symmetry, in the same pass.
+    """
+    map_chunk = gmp_blocks.get_map_chunk_name(chunk_infos)
+    if map_chunk is None:
+        print("Error: the map has no block data (UMAP, DMAP or CMAP).")
+        return -2
+
+    filename = get_filename(gmp_path)
+
+    for spec, _ in plugins or []:
+        try:
+            gmp_plugins.load_plugin(spec)
+        except ValueError as error:
+            print(f"Error: {error}")
+            return -1
+
+    # reject the symmetries which would move zones, lights or objects out of the map
+    zones_info_array = rotate_gmp.get_zones_info_data(gmp_path, chunk_infos)
+    light_info_array = rotate_gmp.get_light_info_data(gmp_path, chunk_infos)
+    objects_info_array = rotate_gmp.get_objects_info_data(gmp_path, chunk_infos)
+
+    transform_steps = { get_transform_name(symmetry_name, translation) : get_transform_steps(symmetry_name, translation, plugins)
+                        for symmetry_name in symmetry_names }
+
+    for transform_name, steps in transform_steps.items():
+        errors = validate_zones_and_lights(zones_info_array, light_info_array, steps)
+        errors += validate_objects(objects_info_array, steps)
+        if errors:
+            print(f"Error: {len(errors)} zones/lights/objects can't be transformed by {transform_name}:")
+            for error in errors:
+                print(f"  {error}")
+            return -3
+
+    # the outputs of the same map and transform (by the same engine) are linked from
+    # the cache; the plugins aren't part of the engine, so their outputs aren't cached
+    cache_keys = dict()
+    if not plugins:
+        for transform_name, steps in list(transform_steps.items()):
+            output_path = out_path / f"{filename}_{transform_name}.gmp"
+            cache_keys[transform_name] = gmp_cache.get_output_key(gmp_path, steps)
+            if gmp_cache.link_cached_output(cache_keys[transform_name], output_path):
+                print(f"Created {output_path} (from cache)")
+                del transform_steps[transform_name]
+
+    if not transform_steps:
+        print(f"\nSuccess! {len(symmetry_names)} symmetries of {filename}.gmp created.")
+        return 0
+
+    shm, layout = load_map_to_shared_memory(gmp_path, chunk_infos)
+    if shm is None:
+        return -1
+    try:
+        # only the translations can move blocks out of the map
+        if translation is not None and "UMAP" in layout:
+            blocks_boxes = get_blocks_boxes(shm.buf, layout["UMAP"][0])
+            for transform_name, steps in transform_steps.items():
+                errors = validate_blocks(blocks_boxes, steps)
+                if errors:
+                    print(f"Error: {len(errors)} z levels can't be transformed by {transform_name}:")
+                    for error in errors:
+                        print(f"  {error}")
+                    return -3
+
+        with ProcessPoolExecutor(max_workers=num_workers or len(symmetry_names)) as executor:
+            futures = { transform_name : executor.submit(write_symmetry_from_shared_memory,
+                                                         shm.name,
+                                                         layout,
+                                                         gmp_path,
+                                                         chunk_infos,
+                                                         map_chunk,
+                                                         steps,
+                                                         out_path / f"{filename}_{transform_name}.gmp")
+                        for transform_name, steps in transform_steps.items() }
+            for transform_name, future in futures.items():
+                try:
+                    output_path = future.result()
+                except ValueError as error:     # raised by a plugin
+                    print(f"Error: {error}")
+                    return -1
+                if output_path is None:
+                    print(f"Error: {filename}_{transform_name}.gmp not written, the source map is truncated.")
+                    return -1
+                if transform_name in cache_keys:
+                    gmp_cache.add_cached_output(cache_keys[transform_name], output_path)
+                print(f"Created {output_path}")
+    finally:
+        shm.close()
+        shm.unlink()
+
+    print(f"\nSuccess! {len(symmetry_names)} symmetries of {filename}.gmp created.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(PROGRAM_NAME)
+    parser.add_argument("gmp_path")
+    parser.add_argument("symmetries", nargs='*', help=f"any of {', '.join(SYMMETRIES)} (default: all)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes")
+    parser.add_argument("-t", "--translate", type=int, nargs=3, metavar=("DX", "DY", "DZ"), help="move the map by DX, DY, DZ blocks after each symmetry (only this if no symmetry is given)")
+    parser.add_argument("-p", "--plugin", action='append', metavar="MODULE:FUNCTION", help="change the blocks with a plugin function before each symmetry (see gmp_plugins.py), can be repeated")
+    parser.add_argument("--plugin-region", type=int, nargs=4, metavar=("X", "Y", "W", "H"), help="blocks given to the plugins in their mask (default: all)")
+    parser.add_argument("--verify", action='store_true', help="only check that rotations/flips are consistent on this map, without writing files")
+    args = parser.parse_args()
+
+    if (args.translate or args.plugin) and not args.symmetries:
+        symmetry_names = [None]     # translation/plugins only
+    else:
+        symmetry_names = args.symmetries or list(SYMMETRIES)
+
+    for symmetry_name in symmetry_names:
+        if symmetry_name is not None and symmetry_name not in SYMMETRIES:
+            print(f"Error: unknown symmetry '{symmetry_name}'. Use any of: {', '.join(SYMMETRIES)}")
+            sys.exit(-1)
+
+    if ("\\" not in args.gmp_path and "/" not in args.gmp_path):
+        gmp_path = ROOT_DIR / args.gmp_path
+    else:
+        gmp_path = Path(args.gmp_path)
+
+    if (not gmp_path.exists()):
+        print("File not found.")
+        sys.exit(-1)
+
+    chunk_infos = rotate_gmp.detect_headers_and_get_chunks(gmp_path)
+
+    if args.verify:
+        if verify_identities(gmp_path, chunk_infos) != 0:
+            sys.exit(1)
+        return
+
+    plugin_region = tuple(args.plugin_region) if args.plugin_region else None
+    plugins = [ (spec, plugin_region) for spec in args.plugin or [] ]
+
+    fan_out_symmetries(gmp_path, chunk_infos, symmetry_names, gmp_path.parent, args.jobs, args.translate, plugins)
+    return
+
+if __name__ == "__main__":
+    main()
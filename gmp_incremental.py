@@ -0,0 +1,191 @@
+from pathlib import Path
+import argparse
+import sys
+import os
+
+import rotate_gmp
+import flip_gmp
+import gmp_writer
+import gmp_blocks
+import gmp_engine
+import gmp_symmetric
+import gmp_diff
+
+PROGRAM_NAME = os.path.basename(sys.argv[0])
+ROOT_DIR = Path(__file__).parent
+
+BLOCK_INFO_SIZE = gmp_blocks.BLOCK_INFO_SIZE
+LAYER_INFO_SIZE = gmp_blocks.LAYER_INFO_SIZE
+MAP_LEVELS = gmp_blocks.MAP_LEVELS
+
+# After a small edit of a map, its previous output (same symmetry/translation) is updated
+# instead of transforming the whole map again: only the blocks that differ between the
+# previous and the new source are transformed and written at their place in the output.
+# The zones, lights and objects are few bytes, so they are transformed again as a whole,
+# and the other chunks (ANIM, RGEN...) are copied from the new source if they changed.
+# Each block of the source goes to one block of the output, so the rest of the output
+# stays as it is.
+
+RECORD_CHUNKS = ["ZONE", "LGHT", "MOBJ"]
+
+def get_block_position(x, y, z, steps):
+    """Move the block at (x, y, z) with the steps, same as its z level.
+    Returns None if it's moved out of the map."""
+    for step_type, value in steps:
+        if step_type == gmp_engine.ROTATE:
+            x, y, _, _ = rotate_gmp.get_rotated_zone_rect((None, x, y, 1, 1), value)
+        elif step_type == gmp_engine.FLIP:
+            x, y, _, _ = flip_gmp.get_flipped_zone_rect((None, x, y, 1, 1), value)
+        elif step_type == gmp_engine.TRANSLATE:
+            x, y, z = x + value[0], y + value[1], z + value[2]
+    if not (0 <= x <= 255 and 0 <= y <= 255 and 0 <= z < MAP_LEVELS):
+        return None
+    return x, y, z
+
+def patch_blocks(output_store, old_store, new_store, steps):
+    """Write in the output block store (bytearray) the transformed blocks that changed
+    between the old and the new source.
+
+    Returns the number of blocks written and a list of error messages (blocks moved out
+    of the map).
+    """
+    block_steps = [ step for step in steps if step[0] in (gmp_engine.ROTATE, gmp_engine.FLIP) ]
+    cache = dict()
+    num_changed = 0
+    errors = []
+
+    for z in range(MAP_LEVELS):
+        layer_offset = z*LAYER_INFO_SIZE
+        old_layer = old_store[layer_offset : layer_offset + LAYER_INFO_SIZE]
+        new_layer = new_store[layer_offset : layer_offset + LAYER_INFO_SIZE]
+
+        for block_idx in gmp_engine.get_different_blocks(old_layer, new_layer, 256*256):
+            block_data = bytes(new_layer[block_idx*BLOCK_INFO_SIZE : (block_idx + 1)*BLOCK_INFO_SIZE])
+            x, y = block_idx % 256, block_idx // 256
+
+            position = get_block_position(x, y, z, steps)
+            if position is None:
+                if block_data != bytes(BLOCK_INFO_SIZE):
+                    errors.append(f"Block x = {x}, y = {y}, z = {z}: moved out of the map")
+                continue
+
+            new_x, new_y, new_z = position
+            offset = new_z*LAYER_INFO_SIZE + (new_y*256 + new_x)*BLOCK_INFO_SIZE
+            output_store[offset : offset + BLOCK_INFO_SIZE] = gmp_symmetric.transform_rect_blocks([block_data], 1, 1, block_steps, cache)[0]
+            num_changed += 1
+
+    return num_changed, errors
+
+def get_changed_chunks(old_path, old_infos, new_path, new_infos, skipped_chunks):
+    """Get the data of the chunks of the new source which differ from the old source,
+    and the chunks removed from it"""
+    changed_chunks = dict()
+    removed_chunks = []
+    for chunk_name in new_infos:
+        if chunk_name in skipped_chunks:
+            continue
+        old_data = gmp_diff.read_chunk(old_path, old_infos, chunk_name)
+        new_data = gmp_diff.read_chunk(new_path, new_infos, chunk_name)
+        if new_data is None:
+            if old_data is not None:
+                removed_chunks.append(chunk_name)
+        elif new_data != old_data:
+            changed_chunks[chunk_name] = new_data
+    return changed_chunks, removed_chunks
+
+def update_gmp(old_path, old_infos, output_path, output_infos, new_path, new_infos, steps, updated_path):
+    """Update the output of 'steps' applied to the old source so it becomes the output of
+    the new source, written to 'updated_path' (which can be 'output_path')"""
+    map_chunk = gmp_blocks.get_map_chunk_name(new_infos)
+    if map_chunk is None or gmp_blocks.get_map_chunk_name(old_infos) != map_chunk:
+        print("Error: both sources must have their blocks in the same chunk (UMAP, DMAP or CMAP).")
+        return -2
+    if output_infos["UMAP"][0] is None or output_infos["UMAP"][1] != gmp_blocks.UMAP_SIZE:
+        print("Error: the output has no uncompressed map (UMAP), it isn't an output of the rotator.")
+        return -2
+
+    zones_info_array = rotate_gmp.get_zones_info_data(new_path, new_infos)
+    light_info_array = rotate_gmp.get_light_info_data(new_path, new_infos)
+    objects_info_array = rotate_gmp.get_objects_info_data(new_path, new_infos)
+
+    errors = gmp_engine.validate_zones_and_lights(zones_info_array, light_info_array, steps)
+    errors += gmp_engine.validate_objects(objects_info_array, steps)
+    if errors:
+        print(f"Error: {len(errors)} zones/lights/objects can't be transformed:")
+        for error in errors:
+            print(f"  {error}")
+        return -3
+
+    skipped_chunks = [map_chunk] + RECORD_CHUNKS
+    new_chunks, removed_chunks = get_changed_chunks(old_path, old_infos, new_path, new_infos, skipped_chunks)
+    if removed_chunks:
+        print(f"Error: chunks {', '.join(removed_chunks)} removed from the source, transform the whole map again.")
+        return -1
+
+    old_store = gmp_blocks.read_block_store(old_path, old_infos)
+    new_store = gmp_blocks.read_block_store(new_path, new_infos)
+    if old_store is None or new_store is None:
+        return -1
+    output_store = bytearray(gmp_diff.read_chunk(output_path, output_infos, "UMAP"))
+
+    num_changed, errors = patch_blocks(output_store, old_store, new_store, steps)
+    if errors:
+        print(f"Error: {len(errors)} blocks can't be transformed:")
+        for error in errors:
+            print(f"  {error}")
+        return -3
+    print(f"{num_changed} blocks changed.")
+
+    new_chunks["UMAP"] = output_store
+
+    zones, lights = gmp_engine.transform_zones_and_lights(zones_info_array, light_info_array, steps)
+    objects = gmp_engine.transform_objects(objects_info_array, steps)
+    for chunk_name, records in zip(RECORD_CHUNKS, (zones, lights, objects)):
+        if records is not None or output_infos[chunk_name][0] is not None:
+            new_chunks[chunk_name] = records or []
+
+    # the output is the source of the writer, which can write over it (see 'gmp_writer')
+    print(f"Writing {updated_path}")
+    if gmp_writer.write_gmp(output_path, updated_path, output_infos, new_chunks) != 0:
+        return -1
+
+    print("\nSuccess! Output updated.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(PROGRAM_NAME, description="Update the rotated/flipped output of a map after editing the map")
+    parser.add_argument("old_source_path", help="map the output was made from")
+    parser.add_argument("output_path", help="rotated/flipped map, updated in place")
+    parser.add_argument("new_source_path", help="edited map")
+    parser.add_argument("symmetry", nargs='?', help=f"symmetry of the output: any of {', '.join(gmp_engine.SYMMETRIES)}")
+    parser.add_argument("-t", "--translate", type=int, nargs=3, metavar=("DX", "DY", "DZ"), help="translation of the output after the symmetry")
+    parser.add_argument("-o", "--output", help="write the updated map here instead of replacing the output")
+    args = parser.parse_args()
+
+    if args.symmetry is None and args.translate is None:
+        print("Error: give the symmetry and/or the translation of the output.")
+        sys.exit(-1)
+    if args.symmetry is not None and args.symmetry not in gmp_engine.SYMMETRIES:
+        print(f"Error: unknown symmetry '{args.symmetry}'. Use any of: {', '.join(gmp_engine.SYMMETRIES)}")
+        sys.exit(-1)
+
+    paths = [ ROOT_DIR / path if ("\\" not in path and "/" not in path) else Path(path)
+              for path in (args.old_source_path, args.output_path, args.new_source_path) ]
+    if not all(path.exists() for path in paths):
+        print("File not found.")
+        sys.exit(-1)
+    old_path, output_path, new_path = paths
+
+    old_infos = rotate_gmp.detect_headers_and_get_chunks(old_path)
+    output_infos = rotate_gmp.detect_headers_and_get_chunks(output_path)
+    new_infos = rotate_gmp.detect_headers_and_get_chunks(new_path)
+
+    steps = gmp_engine.get_transform_steps(args.symmetry, args.translate)
+    updated_path = Path(args.output) if args.output else output_path
+    if update_gmp(old_path, old_infos, output_path, output_infos, new_path, new_infos, steps, updated_path) != 0:
+        sys.exit(-1)
+    return
+
+if __name__ == "__main__":
+    main()
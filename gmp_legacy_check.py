@@ -0,0 +1,159 @@
+from pathlib import Path
+import argparse
+import tempfile
+import shutil
+import time
+import sys
+import os
+
+import rotate_gmp
+import flip_gmp
+import gmp_blocks
+import gmp_engine
+
+PROGRAM_NAME = os.path.basename(sys.argv[0])
+
+BLOCK_INFO_SIZE = gmp_blocks.BLOCK_INFO_SIZE
+LAYER_INFO_SIZE = gmp_blocks.LAYER_INFO_SIZE
+
+# Compares the legacy path (whole map read in a list of blocks, 'rotate_info'/'flip_info'
+# block by block, then 'rotate_map'/'flip_map' writing the blocks in their new order) with
+# the engine path ('transform_layer' one z level at a time, with memoized blocks).
+
+# FLIP_XY isn't checked: the legacy 'flip_lid' fails with it
+TRANSFORMS = [ ("rotate 90", gmp_engine.ROTATE, 90),
+               ("rotate 180", gmp_engine.ROTATE, 180),
+               ("rotate 270", gmp_engine.ROTATE, 270),
+               ("flip x", gmp_engine.FLIP, flip_gmp.FLIP_X),
+               ("flip y", gmp_engine.FLIP, flip_gmp.FLIP_Y) ]
+
+LID_TILES = [0, 1, 1023]
+
+def get_side_words(variant, i):
+    """Get the (left, right, top, bottom) words of one of the 4 side variants"""
+    flags = (i % 64) << 10    # wall, bullet wall, flat, flip and rotation bits
+    if variant == 0:
+        return (0, 0, 0, 0)
+    elif variant == 1:
+        return (flags + 1, flags + 2, flags + 3, flags + 1023)
+    elif variant == 2:
+        return (flags + 5, 0, 0, 0)
+    else:
+        return (0, 0, flags + 7, 0)
+
+def build_combination_layers():
+    """Build the z levels of a map with every combination of slope byte (slope and block
+    type), lid tile (0, 1, 1023) with every lid flag (bits 10 to 15) and 4 kinds of sides.
+    The arrows byte takes every value along the way."""
+    blocks = bytearray()
+    i = 0
+    for slope_byte in range(256):
+        for lid_tile in LID_TILES:
+            for lid_flags in range(64):
+                for side_variant in range(4):
+                    for word in get_side_words(side_variant, i):
+                        blocks += int.to_bytes(word, 2, 'little')
+                    blocks += int.to_bytes((lid_flags << 10) + lid_tile, 2, 'little')
+                    blocks += bytes([i % 256, slope_byte])
+                    i += 1
+
+    blocks += bytes(-len(blocks) % LAYER_INFO_SIZE)
+    blocks += bytes(gmp_blocks.UMAP_SIZE - len(blocks))
+    return [ bytes(blocks[offset : offset + LAYER_INFO_SIZE]) for offset in range(0, gmp_blocks.UMAP_SIZE, LAYER_INFO_SIZE) ]
+
+def write_umap_gmp(gmp_path, layers):
+    """Write a gmp with the UMAP chunk only, readable by the legacy functions"""
+    umap_data = b''.join(layers)
+    with open(gmp_path, 'wb') as file:
+        file.write(b'GBMP' + int.to_bytes(500, 2, 'little'))
+        file.write(b'UMAP' + int.to_bytes(len(umap_data), 4, 'little'))
+        file.write(umap_data)
+
+def run_legacy(gmp_path, work_dir, step_type, value):
+    """Transform the UMAP of 'gmp_path' with the legacy functions, returns the z levels"""
+    chunk_infos = rotate_gmp.detect_headers_and_get_chunks(gmp_path)
+    output_path = work_dir / "legacy.gmp"
+    shutil.copyfile(gmp_path, output_path)
+
+    if step_type == gmp_engine.ROTATE:
+        block_info_array = rotate_gmp.get_block_info_data(gmp_path, chunk_infos)
+        rotate_gmp.rotate_info(block_info_array, value)
+        rotate_gmp.rotate_map(output_path, chunk_infos, value, block_info_array)
+    else:
+        block_info_array = flip_gmp.get_block_info_data(gmp_path, chunk_infos)
+        flip_gmp.flip_info(block_info_array, value)
+        flip_gmp.flip_map(output_path, chunk_infos, value, block_info_array)
+
+    return list(gmp_blocks.read_uncompressed_layers(output_path, chunk_infos))
+
+def check_layers(name, layers, work_dir, max_differences):
+    """Run every transform through both paths and compare the results.
+
+    Returns the number of transforms with different results.
+    """
+    gmp_path = work_dir / "source.gmp"
+    write_umap_gmp(gmp_path, layers)
+
+    num_failed = 0
+    for transform_name, step_type, value in TRANSFORMS:
+        start = time.perf_counter()
+        legacy_layers = run_legacy(gmp_path, work_dir, step_type, value)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        engine_layers = [ gmp_engine.transform_layer(layer_data, ((step_type, value),)) for layer_data in layers ]
+        engine_time = time.perf_counter() - start
+
+        differences = []
+        for z, (legacy_layer, engine_layer) in enumerate(zip(legacy_layers, engine_layers)):
+            for block_idx in gmp_engine.get_different_blocks(legacy_layer, engine_layer, max_differences - len(differences)):
+                offset = block_idx*BLOCK_INFO_SIZE
+                differences.append(f"x = {block_idx % 256}, y = {block_idx // 256}, z = {z}: "
+                                   f"legacy {legacy_layer[offset : offset + BLOCK_INFO_SIZE].hex(' ')}, "
+                                   f"engine {engine_layer[offset : offset + BLOCK_INFO_SIZE].hex(' ')}")
+            if len(differences) >= max_differences:
+                break
+
+        timings = f"legacy {legacy_time:.2f} s, engine {engine_time:.2f} s ({legacy_time / max(engine_time, 1e-9):.1f}x)"
+        if differences:
+            num_failed += 1
+            print(f"DIFF  {name}, {transform_name}: {timings}")
+            for difference in differences:
+                print(f"  {difference}")
+        else:
+            print(f"OK    {name}, {transform_name}: {timings}")
+
+    return num_failed
+
+
+def main():
+    parser = argparse.ArgumentParser(PROGRAM_NAME, description="Check that the engine gives the same blocks as the legacy rotate/flip functions")
+    parser.add_argument("gmp_paths", nargs='*', help="maps to check, besides every combination of block fields")
+    parser.add_argument("-n", "--max_differences", type=int, default=5, help="number of different blocks listed")
+    args = parser.parse_args()
+
+    num_failed = 0
+    with tempfile.TemporaryDirectory() as work_dir:
+        work_dir = Path(work_dir)
+
+        num_failed += check_layers("block combinations", build_combination_layers(), work_dir, args.max_differences)
+
+        for gmp_path in args.gmp_paths:
+            gmp_path = Path(gmp_path)
+            chunk_infos = rotate_gmp.detect_headers_and_get_chunks(gmp_path)
+            block_store = gmp_blocks.read_block_store(gmp_path, chunk_infos)
+            if block_store is None:
+                print(f"Error: {gmp_path} has no block data.")
+                num_failed += 1
+                continue
+            layers = [ bytes(block_store[offset : offset + LAYER_INFO_SIZE]) for offset in range(0, gmp_blocks.UMAP_SIZE, LAYER_INFO_SIZE) ]
+            num_failed += check_layers(gmp_path.name, layers, work_dir, args.max_differences)
+
+    if num_failed:
+        print(f"\n{num_failed} transforms differ.")
+        sys.exit(1)
+    print("\nThe engine gives the same blocks as the legacy functions.")
+    return
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+from pathlib import Path
+import argparse
+import sys
+import os
+import re
+
+import rotate_gmp
+import gmp_blocks
+import gmp_roads
+
+PROGRAM_NAME = os.path.basename(sys.argv[0])
+
+# Each check is done for a whole z level at once: the field of each block is taken with
+# a byte slice of the level ('grid' of 256*256 bytes, index y*256 + x), mapped with a
+# translate table and compared with the grid shifted by one block (see gmp_roads).
+
+GRID_SIZE = gmp_roads.GRID_SIZE
+
+OPPOSITE_ARROWS = { gmp_roads.ARROW_LEFT : gmp_roads.ARROW_RIGHT,
+                    gmp_roads.ARROW_RIGHT : gmp_roads.ARROW_LEFT,
+                    gmp_roads.ARROW_UP : gmp_roads.ARROW_DOWN,
+                    gmp_roads.ARROW_DOWN : gmp_roads.ARROW_UP }
+
+# slope byte -> slope type
+SLOPE_TABLE = bytes( byte >> 2 for byte in range(256) )
+
+# the pieces of each ramp, from the lowest to the highest
+RAMPS = [ [1, 2], [3, 4], [5, 6], [7, 8],                   # 1/2 slopes: up, down, left, right
+          list(range(9, 17)), list(range(17, 25)),          # 1/8 slopes: up, down
+          list(range(25, 33)), list(range(33, 41)) ]        #             left, right
+
+VERTICAL_SLOPES = set(range(1, 5)) | set(range(9, 25))
+
+NONZERO_TABLE = bytes( 1 if byte != 0 else 0 for byte in range(256) )
+ZERO_TABLE = bytes( 1 if byte == 0 else 0 for byte in range(256) )
+
+def get_ramp_tables():
+    """Get the translate tables slope type -> next/previous piece of the same ramp (0 if
+    there is none), for the vertical and horizontal slopes"""
+    tables = dict()
+    for vertical in (True, False):
+        next_table = bytearray(256)
+        previous_table = bytearray(256)
+        for ramp in RAMPS:
+            if (ramp[0] in VERTICAL_SLOPES) != vertical:
+                continue
+            for i in range(len(ramp) - 1):
+                next_table[ramp[i]] = ramp[i + 1]
+                previous_table[ramp[i + 1]] = ramp[i]
+        tables[vertical] = (bytes(next_table), bytes(previous_table))
+    return tables
+
+RAMP_TABLES = get_ramp_tables()
+
+# arrow -> translate tables directions -> 1 if the block has the arrow, 1 if the block has
+# the opposite arrow but not the arrow itself
+HEAD_ON_TABLES = { arrow : ( bytes( 1 if byte & arrow else 0 for byte in range(256) ),
+                             bytes( 1 if (byte & opposite and not byte & arrow) else 0 for byte in range(256) ) )
+                   for arrow, opposite in OPPOSITE_ARROWS.items() }
+
+def shift_grid(grid, arrow):
+    """Shift a grid of any values so each block gets the value of its neighbour in the
+    direction of 'arrow' (0 at the border of the map)"""
+    return gmp_roads.get_neighbour_roads(grid, arrow)
+
+def as_int(grid):
+    return int.from_bytes(grid, 'little')
+
+def get_flagged_blocks(flags, z):
+    """Get the (x, y, z) of the blocks with a nonzero byte in the 'flags' int"""
+    if flags == 0:
+        return []
+    flag_grid = flags.to_bytes(GRID_SIZE, 'little')
+    return [ (match.start() % 256, match.start() // 256, z) for match in re.finditer(rb'[^\x00]', flag_grid) ]
+
+def get_neighbour_match(grid, expected, arrow):
+    """1 for each block where the neighbour in the direction of 'arrow' has the expected
+    value, else 0"""
+    difference = (as_int(shift_grid(grid, arrow)) ^ as_int(expected)).to_bytes(GRID_SIZE, 'little')
+    return as_int(difference.translate(ZERO_TABLE))
+
+def lint_arrows(layer_data, z):
+    """Find the arrows pointing to a neighbour block whose arrows point back to it only
+    (head-on traffic). Returns a list of (x, y, z, message)."""
+    directions = bytes(layer_data[10::gmp_blocks.BLOCK_INFO_SIZE]).translate(gmp_roads.DIRECTIONS_TABLE)
+
+    issues = []
+    for arrow, (has_arrow, only_opposite) in HEAD_ON_TABLES.items():
+        head_on = ( as_int(directions.translate(has_arrow))
+                    & as_int(shift_grid(directions.translate(only_opposite), arrow)) )
+
+        for x, y, z in get_flagged_blocks(head_on, z):
+            issues.append((x, y, z, f"arrow {get_arrow_name(arrow)} points to the opposite arrow of the next block"))
+    return issues
+
+def lint_slopes(layer_data, z):
+    """Find the ramp pieces without the next (or previous) piece of the same ramp in a
+    neighbour block along the slope. Returns a list of (x, y, z, message)."""
+    slopes = bytes(layer_data[11::gmp_blocks.BLOCK_INFO_SIZE]).translate(SLOPE_TABLE)
+
+    issues = []
+    for vertical, (next_table, previous_table) in RAMP_TABLES.items():
+        arrows = (gmp_roads.ARROW_UP, gmp_roads.ARROW_DOWN) if vertical else (gmp_roads.ARROW_LEFT, gmp_roads.ARROW_RIGHT)
+
+        for table, piece_name in ((next_table, "next"), (previous_table, "previous")):
+            expected = slopes.translate(table)
+
+            # the piece can be at either side, the direction of the ramp isn't checked
+            found = get_neighbour_match(slopes, expected, arrows[0]) | get_neighbour_match(slopes, expected, arrows[1])
+            missing = as_int(expected.translate(NONZERO_TABLE)) & ~found
+
+            for x, y, z in get_flagged_blocks(missing, z):
+                slope_type = slopes[y*256 + x]
+                issues.append((x, y, z, f"slope {slope_type}: {piece_name} piece of the ramp ({table[slope_type]}) not found"))
+    return issues
+
+def get_arrow_name(arrow):
+    return { gmp_roads.ARROW_LEFT : "left",
+             gmp_roads.ARROW_RIGHT : "right",
+             gmp_roads.ARROW_UP : "up",
+             gmp_roads.ARROW_DOWN : "down" }[arrow]
+
+def lint_map(levels):
+    """Check the arrows and slopes of every z level of the map.
+
+    Returns a list of (x, y, z, message), empty if no issue was found.
+    """
+    issues = []
+    for z, layer_data in enumerate(levels):
+        issues += lint_arrows(layer_data, z)
+        issues += lint_slopes(layer_data, z)
+    issues.sort(key=lambda issue: (issue[2], issue[1], issue[0]))
+    return issues
+
+
+def main():
+    parser = argparse.ArgumentParser(PROGRAM_NAME, description="Check the arrows and slopes of a map")
+    parser.add_argument("gmp_path")
+    parser.add_argument("-n", "--max_issues", type=int, default=50, help="number of issues listed")
+    args = parser.parse_args()
+
+    gmp_path = Path(args.gmp_path)
+    if (not gmp_path.exists()):
+        print("File not found.")
+        sys.exit(-1)
+
+    chunk_infos = rotate_gmp.detect_headers_and_get_chunks(gmp_path)
+    layers = gmp_blocks.read_umap_layers(gmp_path, chunk_infos)
+    if layers is None:
+        print("Error: the map has no block data.")
+        sys.exit(-1)
+
+    issues = lint_map(layers)
+
+    print(f"\n{len(issues)} issues found.")
+    for x, y, z, message in issues[:args.max_issues]:
+        print(f"  x = {x}, y = {y}, z = {z}: {message}")
+    if len(issues) > args.max_issues:
+        print(f"  ... and {len(issues) - args.max_issues} more")
+
+    if issues:
+        sys.exit(1)
+    return
+
+if __name__ == "__main__":
+    main()
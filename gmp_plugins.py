@@ -0,0 +1,131 @@
+from functools import lru_cache
+from pathlib import Path
+from array import array
+import importlib
+import importlib.util
+import sys
+
+import gmp_blocks
+
+BLOCK_INFO_SIZE = gmp_blocks.BLOCK_INFO_SIZE
+LAYER_INFO_SIZE = gmp_blocks.LAYER_INFO_SIZE
+
+FACE_NAMES = ["left", "right", "top", "bottom", "lid"]     # order of the words of a block
+FIELD_NAMES = FACE_NAMES + ["arrows", "slope_type", "block_type"]
+
+# A plugin is a function of any python module or file, given as "module:function" or
+# "path/to/file.py:function". It's called for each z level with the fields of its 256x256
+# blocks, as arrays indexed by y*256 + x:
+#
+#   left, right, top, bottom, lid   array('H') of the side/lid words (see 'decode_side')
+#   arrows                          array('B'), green arrows in the low nibble, red in the high one
+#   slope_type, block_type          array('B') of the 2 parts of the last byte of the blocks
+#
+# along with the mask of the blocks to change (bytes, 1 for each block inside the region
+# given to the plugin, every block if none) and the z level:
+#
+#   def clear_arrows(fields, mask, z):
+#       fields["arrows"] = array('B', [ 0 if inside else arrows for arrows, inside in zip(fields["arrows"], mask) ])
+#       return fields
+#
+# It returns the fields, changed in place or replaced (any field left out is kept).
+
+BLOCK_TYPE_TABLE = bytes(byte % 4 for byte in range(256))
+SLOPE_TYPE_TABLE = bytes(byte >> 2 for byte in range(256))
+
+loaded_plugins = dict()     # spec -> function, once per process
+
+def load_plugin(spec):
+    """Get the function of a plugin spec "module:function" or "file.py:function".
+    Raises ValueError if it can't be loaded."""
+    function = loaded_plugins.get(spec)
+    if function is not None:
+        return function
+
+    module_name, _, function_name = spec.rpartition(":")
+    if not module_name or not function_name:
+        raise ValueError(f"wrong plugin '{spec}', use module:function or file.py:function")
+
+    try:
+        if module_name.endswith(".py"):
+            module_path = Path(module_name)
+            module_spec = importlib.util.spec_from_file_location(module_path.stem, module_path)
+            if module_spec is None or not module_path.exists():
+                raise ValueError(f"plugin file {module_path} not found")
+            module = importlib.util.module_from_spec(module_spec)
+            module_spec.loader.exec_module(module)
+        else:
+            module = importlib.import_module(module_name)
+    except ImportError as error:
+        raise ValueError(f"can't import the plugin module {module_name}: {error}")
+
+    function = getattr(module, function_name, None)
+    if not callable(function):
+        raise ValueError(f"the plugin module {module_name} has no function {function_name}")
+
+    loaded_plugins[spec] = function
+    return function
+
+@lru_cache(maxsize=16)
+def get_region_mask(rect):
+    """Get the mask of the rectangle (x, y, w, h) of blocks, or of the whole z level if None"""
+    if rect is None:
+        return bytes([1])*(256*256)
+    x, y, w, h = rect
+    mask = bytearray(256*256)
+    for row_y in range(max(y, 0), min(y + h, 256)):
+        mask[row_y*256 + max(x, 0) : row_y*256 + min(x + w, 256)] = bytes([1])*(min(x + w, 256) - max(x, 0))
+    return bytes(mask)
+
+def split_fields(layer_data):
+    """Get the field arrays of the blocks of a z level"""
+    words = array('H')
+    words.frombytes(layer_data)
+    if sys.byteorder == 'big':
+        words.byteswap()
+
+    fields = { face_name : words[face_idx::6] for face_idx, face_name in enumerate(FACE_NAMES) }
+    fields["arrows"] = array('B', layer_data[10::BLOCK_INFO_SIZE])
+    fields["slope_type"] = array('B', layer_data[11::BLOCK_INFO_SIZE].translate(SLOPE_TYPE_TABLE))
+    fields["block_type"] = array('B', layer_data[11::BLOCK_INFO_SIZE].translate(BLOCK_TYPE_TABLE))
+    return fields
+
+def join_fields(fields):
+    """Get the z level of UMAP of the field arrays"""
+    words = array('H', bytes(LAYER_INFO_SIZE))
+    for face_idx, face_name in enumerate(FACE_NAMES):
+        words[face_idx::6] = array('H', fields[face_name])
+    if sys.byteorder == 'big':
+        words.byteswap()
+
+    layer_data = bytearray(words.tobytes())
+    layer_data[10::BLOCK_INFO_SIZE] = bytes(fields["arrows"])
+    layer_data[11::BLOCK_INFO_SIZE] = bytes([ (slope_type << 2) | block_type
+                                              for slope_type, block_type in zip(fields["slope_type"], fields["block_type"]) ])
+    return bytes(layer_data)
+
+def apply_plugin(layer_data, z, plugin):
+    """Run a plugin (spec, rectangle or None) on a z level. Returns the new z level."""
+    spec, rect = plugin
+    function = load_plugin(spec)
+    fields = split_fields(layer_data)
+
+    try:
+        new_fields = function(fields, get_region_mask(rect), z)
+    except Exception as error:      # any error of the plugin code
+        raise ValueError(f"the plugin {spec} failed: {type(error).__name__}: {error}")
+    if not isinstance(new_fields, dict):
+        raise ValueError(f"the plugin {spec} must return the dict of fields")
+    fields.update(new_fields)
+
+    for field_name in FIELD_NAMES:
+        if len(fields[field_name]) != 256*256:
+            raise ValueError(f"the plugin {spec} returned {len(fields[field_name])} values of {field_name} instead of {256*256}")
+
+    if max(fields["block_type"]) > 3:
+        raise ValueError(f"the plugin {spec} returned block types over 3")
+
+    try:
+        return join_fields(fields)
+    except (ValueError, OverflowError, TypeError) as error:
+        raise ValueError(f"the plugin {spec} returned wrong values: {error}")
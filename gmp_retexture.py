@@ -0,0 +1,165 @@
+from pathlib import Path
+from collections import Counter
+from array import array
+import argparse
+import json
+import sys
+import os
+
+import rotate_gmp
+import gmp_writer
+import gmp_blocks
+import gmp_engine
+import gmp_stats
+
+PROGRAM_NAME = os.path.basename(sys.argv[0])
+ROOT_DIR = Path(__file__).parent
+
+FACE_NAMES = ["left", "right", "top", "bottom", "lid"]     # order of the words of a block
+SIDE_NAMES = FACE_NAMES[:4]
+
+TILE_MASK = 0x3FF       # 10 bits of tile index, the upper 6 bits are kept
+
+# The tile map is a JSON object "old tile" : new tile, applied to every face. It may also
+# have an object per face ("left", "right", "top", "bottom", "lid", or "sides" for the 4
+# sides), whose entries replace the general ones for that face:
+#
+#   { "12" : 40, "lid" : { "200" : 201 }, "sides" : { "7" : 0 } }
+#
+# Each face gets a table with the new word of every possible word (65536 entries), then
+# the words of that face are replaced in a whole z level at once.
+
+def get_face_tile_maps(tile_map):
+    """Get the {old tile: new tile} dict of each face (None if nothing to change) from a
+    tile map read from JSON. Returns the dicts and a list of error messages."""
+    errors = []
+    general = dict()
+    per_face = { face_name : dict() for face_name in FACE_NAMES }
+
+    def add_entries(entries, targets, where):
+        if not isinstance(entries, dict):
+            errors.append(f"{where}: expected an object of \"old tile\" : new tile")
+            return
+        for old_tile, new_tile in entries.items():
+            if (not old_tile.isdigit() or int(old_tile) > TILE_MASK
+                or not isinstance(new_tile, int) or not 0 <= new_tile <= TILE_MASK):
+                errors.append(f"{where}: wrong entry \"{old_tile}\" : {new_tile} (tiles are 0-{TILE_MASK})")
+                continue
+            for target in targets:
+                target[int(old_tile)] = new_tile
+
+    for key, value in tile_map.items():
+        if key in FACE_NAMES:
+            add_entries(value, [per_face[key]], key)
+        elif key == "sides":
+            add_entries(value, [ per_face[face_name] for face_name in SIDE_NAMES ], key)
+        elif key.isdigit():
+            add_entries({ key : value }, [general], "tiles")
+        else:
+            errors.append(f"unknown key \"{key}\", use a tile or any of {', '.join(FACE_NAMES + ['sides'])}")
+
+    face_tile_maps = []
+    for face_name in FACE_NAMES:
+        face_map = dict(general)
+        face_map.update(per_face[face_name])
+        face_map = { old_tile : new_tile for old_tile, new_tile in face_map.items() if old_tile != new_tile }
+        face_tile_maps.append(face_map if face_map else None)
+    return face_tile_maps, errors
+
+def get_word_table(face_tile_map):
+    """Get the new word of each of the 65536 words, with the tile replaced and the flip,
+    flat, lighting/wall and rotation bits kept"""
+    tile_table = [ face_tile_map.get(tile, tile) for tile in range(TILE_MASK + 1) ]
+    return array('H', [ (word & ~TILE_MASK) | tile_table[word & TILE_MASK] for word in range(65536) ])
+
+def remap_layer(layer_data, word_tables, counts):
+    """Replace the tiles of every face of the z level. 'counts' sums up the number of
+    faces changed, by face name."""
+    words = gmp_stats.get_layer_words(layer_data)
+
+    for face_idx, word_table in enumerate(word_tables):
+        if word_table is None:
+            continue
+        face_words = words[face_idx::6]
+        new_words = array('H', map(word_table.__getitem__, face_words))
+        if new_words == face_words:
+            continue
+        counts[FACE_NAMES[face_idx]] += sum(count for word, count in Counter(face_words).items() if word_table[word] != word)
+        words[face_idx::6] = new_words
+
+    if sys.byteorder == 'big':
+        words.byteswap()
+    return words.tobytes()
+
+def retexture_gmp(gmp_path, chunk_infos, face_tile_maps, output_path):
+    map_chunk = gmp_blocks.get_map_chunk_name(chunk_infos)
+    if map_chunk is None:
+        print("Error: the map has no block data.")
+        return -2
+
+    layers = gmp_blocks.read_umap_layers(gmp_path, chunk_infos)
+    if layers is None:
+        return -1
+
+    word_tables = [ get_word_table(face_map) if face_map is not None else None for face_map in face_tile_maps ]
+    counts = Counter()
+
+    print("Replacing tiles...")
+    new_chunks = { map_chunk : (remap_layer(layer_data, word_tables, counts) for layer_data in layers) }
+
+    print(f"Writing {output_path}")
+    if gmp_writer.write_gmp(gmp_path, output_path, chunk_infos, new_chunks, {map_chunk: "UMAP"}) != 0:
+        return -1
+
+    for face_name in FACE_NAMES:
+        print(f"{face_name}: {counts[face_name]} tiles replaced")
+    print("\nSuccess! Map retextured.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(PROGRAM_NAME, description="Replace the tiles of the lids and sides of every block of a map")
+    parser.add_argument("gmp_path")
+    parser.add_argument("tile_map", help="JSON file of \"old tile\" : new tile, optionally per face (left, right, top, bottom, lid, sides)")
+    parser.add_argument("-o", "--output", help="map to write (default: [name]_retextured.gmp)")
+    args = parser.parse_args()
+
+    if ("\\" not in args.gmp_path and "/" not in args.gmp_path):
+        gmp_path = ROOT_DIR / args.gmp_path
+    else:
+        gmp_path = Path(args.gmp_path)
+
+    if (not gmp_path.exists() or not Path(args.tile_map).exists()):
+        print("File not found.")
+        sys.exit(-1)
+
+    try:
+        with open(args.tile_map, 'r') as file:
+            tile_map = json.load(file)
+    except json.JSONDecodeError as error:
+        print(f"Error: {args.tile_map} isn't valid JSON: {error}")
+        sys.exit(-1)
+
+    if not isinstance(tile_map, dict):
+        print(f"Error: {args.tile_map} must have a JSON object of \"old tile\" : new tile.")
+        sys.exit(-1)
+
+    face_tile_maps, errors = get_face_tile_maps(tile_map)
+    if errors:
+        print(f"Error: wrong tile map {args.tile_map}:")
+        for error in errors:
+            print(f"  {error}")
+        sys.exit(-1)
+
+    if args.output:
+        output_path = Path(args.output)
+    else:
+        output_path = gmp_path.parent / f"{gmp_engine.get_filename(gmp_path)}_retextured.gmp"
+
+    chunk_infos = rotate_gmp.detect_headers_and_get_chunks(gmp_path)
+    if retexture_gmp(gmp_path, chunk_infos, face_tile_maps, output_path) != 0:
+        sys.exit(-1)
+    return
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+from array import array
+from pathlib import Path
+import argparse
+import sys
+import os
+
+import rotate_gmp
+import gmp_blocks
+
+PROGRAM_NAME = os.path.basename(sys.argv[0])
+
+# The road network is read from the top road block of each (x, y) of the map: its green
+# and red arrows merged in a single nibble of directions. Grids are bytes of 256*256
+# with the index y*256 + x, where y grows to the south.
+
+ROAD_TYPE = 1
+
+ARROW_LEFT = 1
+ARROW_RIGHT = 2
+ARROW_UP = 4
+ARROW_DOWN = 8
+
+GRID_SIZE = 256*256
+
+# slope byte -> 0xFF if the block is a road, else 0
+ROAD_MASK_TABLE = bytes( 0xFF if byte % 4 == ROAD_TYPE else 0 for byte in range(256) )
+
+# arrows byte -> green and red arrows merged
+DIRECTIONS_TABLE = bytes( (byte // 16) | (byte % 16) for byte in range(256) )
+
+# directions -> 1 if there is a road, else 0
+ROAD_TABLE = bytes( 1 if byte != 0 else 0 for byte in range(256) )
+
+# arrow -> grid step to the neighbour block in that direction
+ARROW_STEPS = ( (ARROW_LEFT, -1), (ARROW_RIGHT, 1), (ARROW_UP, -256), (ARROW_DOWN, 256) )
+
+def get_road_directions(levels):
+    """Get the road directions of the top road block of each (x, y) as a grid (see top
+    of file), 0 where there is no road or the road has no arrows.
+
+    'levels' is an iterable with the block data of each z level, from the ground up.
+    """
+    directions = 0
+    for layer_data in levels:
+        layer_data = bytes(layer_data)
+        road_mask = int.from_bytes(layer_data[11::gmp_blocks.BLOCK_INFO_SIZE].translate(ROAD_MASK_TABLE), 'little')
+        layer_directions = int.from_bytes(layer_data[10::gmp_blocks.BLOCK_INFO_SIZE].translate(DIRECTIONS_TABLE), 'little')
+
+        # the road blocks of this level cover the ones below them
+        directions = (directions & ~road_mask) | (layer_directions & road_mask)
+
+    return directions.to_bytes(GRID_SIZE, 'little')
+
+################ road graph
+
+def get_neighbour_roads(road_grid, arrow):
+    """Shift the 0/1 road grid so each block gets 1 if its neighbour in the direction of
+    'arrow' is a road. Blocks at the border of the map have no neighbour there."""
+    if arrow == ARROW_LEFT:
+        shifted = bytearray(b'\x00' + road_grid[:-1])
+        shifted[0::256] = bytes(256)
+    elif arrow == ARROW_RIGHT:
+        shifted = bytearray(road_grid[1:] + b'\x00')
+        shifted[255::256] = bytes(256)
+    elif arrow == ARROW_UP:
+        shifted = bytes(256) + road_grid[:-256]
+    else:
+        shifted = road_grid[256:] + bytes(256)
+    return bytes(shifted)
+
+def get_road_edges(directions):
+    """Get the arrows of each block which lead to another road block, as a grid.
+
+    Every direction is computed for the whole map at once: the arrow bit of all blocks
+    and-ed with the shifted road grid.
+    """
+    road_grid = directions.translate(ROAD_TABLE)
+    edges = 0
+    for arrow, _ in ARROW_STEPS:
+        arrow_table = bytes( 1 if byte & arrow else 0 for byte in range(256) )
+        has_arrow = int.from_bytes(directions.translate(arrow_table), 'little')
+        has_neighbour = int.from_bytes(get_neighbour_roads(road_grid, arrow), 'little')
+        edges |= (has_arrow & has_neighbour) * arrow     # each block is 0/1, so no carry
+    return edges.to_bytes(GRID_SIZE, 'little')
+
+def build_road_graph(directions):
+    """Build the directed graph of the roads: one node per road block, one edge per arrow
+    to another road block.
+
+    Returns (cells, offsets, targets) in CSR layout:
+        cells[node]                                 grid index (y*256 + x) of the node
+        targets[offsets[node] : offsets[node + 1]]  nodes reached from the node
+    """
+    edges = get_road_edges(directions)
+
+    cells = array('l', ( idx for idx in range(GRID_SIZE) if directions[idx] != 0 ))
+
+    node_of_cell = array('l', [-1])*GRID_SIZE
+    for node, idx in enumerate(cells):
+        node_of_cell[idx] = node
+
+    offsets = array('l', [0])
+    targets = array('l')
+    for idx in cells:
+        block_edges = edges[idx]
+        for arrow, step in ARROW_STEPS:
+            if block_edges & arrow:
+                targets.append(node_of_cell[idx + step])
+        offsets.append(len(targets))
+
+    return cells, offsets, targets
+
+def analyse_road_graph(cells, offsets, targets):
+    """Find the connected components (ignoring the direction of the arrows) and the
+    dead-ends (road blocks with no way out) of the road graph in one pass over the edges.
+
+    Returns (components, num_components, dead_ends): the component of each node, the
+    number of components and the list of dead-end nodes.
+    """
+    parents = array('l', range(len(cells)))
+
+    def find_root(node):
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+
+    dead_ends = []
+    for node in range(len(cells)):
+        if offsets[node] == offsets[node + 1]:
+            dead_ends.append(node)
+        for target in targets[offsets[node] : offsets[node + 1]]:
+            root_1 = find_root(node)
+            root_2 = find_root(target)
+            if root_1 != root_2:
+                parents[max(root_1, root_2)] = min(root_1, root_2)
+
+    # number the components in order of their first node
+    components = array('l', [0])*len(cells)
+    component_of_root = dict()
+    for node in range(len(cells)):
+        root = find_root(node)
+        if root not in component_of_root:
+            component_of_root[root] = len(component_of_root)
+        components[node] = component_of_root[root]
+
+    return components, len(component_of_root), dead_ends
+
+
+def main():
+    parser = argparse.ArgumentParser(PROGRAM_NAME, description="Print the road network of a map")
+    parser.add_argument("gmp_path")
+    parser.add_argument("-n", "--max_dead_ends", type=int, default=20, help="number of dead-ends listed")
+    args = parser.parse_args()
+
+    gmp_path = Path(args.gmp_path)
+    if (not gmp_path.exists()):
+        print("File not found.")
+        sys.exit(-1)
+
+    chunk_infos = rotate_gmp.detect_headers_and_get_chunks(gmp_path)
+    layers = gmp_blocks.read_umap_layers(gmp_path, chunk_infos)
+    if layers is None:
+        print("Error: the map has no block data.")
+        sys.exit(-1)
+
+    cells, offsets, targets = build_road_graph(get_road_directions(layers))
+    components, num_components, dead_ends = analyse_road_graph(cells, offsets, targets)
+
+    print(f"\n{len(cells)} road blocks, {len(targets)} connections, {num_components} road networks.")
+    print(f"{len(dead_ends)} dead-ends:")
+    for node in dead_ends[:args.max_dead_ends]:
+        print(f"  x = {cells[node] % 256}, y = {cells[node] // 256}")
+    if len(dead_ends) > args.max_dead_ends:
+        print(f"  ... and {len(dead_ends) - args.max_dead_ends} more")
+    return
+
+if __name__ == "__main__":
+    main()
@@ -145,7 +145,9 @@ def init_rotate_flip_gmp():
             if return_value == 0:
                 showinfo("Success!", """GMP rotated successfully!\n\nOBS: you need to open it in "uncompressed" mode on DMA editor and compress it to take effect in GTA2.""")
             elif return_value == -2:
-                showinfo("Error!", """This GMP rotator only support uncompressed maps.\n\nOBS: to uncompress a map you need to open it on DMA editor and just click to save it.""")
+                showinfo("Error!", """The map has no block data (UMAP, DMAP or CMAP).\n\nOBS: to write the blocks of a map you need to open it on DMA editor and just click to save it.""")
+            elif return_value == -3:
+                showinfo("Error!", """Some zones or lights are out of the map bounds.\n\nOBS: check the console output for the full list.""")
             else:
                 showinfo("Error!", "Some error ocurred during map rotation.")
 
@@ -188,7 +190,9 @@ def init_rotate_flip_gmp():
             if return_value == 0:
                 showinfo("Success!", """GMP flipped successfully!\n\nOBS: you need to open it in "uncompressed" mode on DMA editor and compress it to take effect in GTA2.""")
             elif return_value == -2:
-                showinfo("Error!", """This GMP flipper only support uncompressed maps.\n\nOBS: to uncompress a map you need to open it on DMA editor and just click to save it.""")
+                showinfo("Error!", """The map has no block data (UMAP, DMAP or CMAP).\n\nOBS: to write the blocks of a map you need to open it on DMA editor and just click to save it.""")
+            elif return_value == -3:
+                showinfo("Error!", """Some zones or lights are out of the map bounds.\n\nOBS: check the console output for the full list.""")
             else:
                 showinfo("Error!", "Some error ocurred during map flipping.")
 
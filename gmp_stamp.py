@@ -0,0 +1,179 @@
+from pathlib import Path
+import argparse
+import sys
+import os
+
+import rotate_gmp
+import gmp_writer
+import gmp_blocks
+import gmp_engine
+import gmp_symmetric
+
+PROGRAM_NAME = os.path.basename(sys.argv[0])
+ROOT_DIR = Path(__file__).parent
+
+MAP_LEVELS = gmp_blocks.MAP_LEVELS
+
+# A region is a box of blocks (x, y, z, w, h, d): w x h blocks on each of the d z levels
+# from z. It's copied into another map at a target (x, y, z), after an optional symmetry
+# (see 'gmp_engine.SYMMETRIES') of the region itself. The zones, lights and objects go
+# through the same symmetry applied to the whole map, followed by the translation which
+# takes the moved region to the target.
+
+def get_stamp_steps(region, target, symmetry_name=None):
+    """Get the steps of the symmetry of the region, then the translation to the target.
+
+    Returns the symmetry steps, the whole steps (for zones, lights and objects) and the
+    rectangle (x, y, w, h) of the region in the target map.
+    """
+    x, y, z, w, h, _ = region
+    target_x, target_y, target_z = target
+    symmetry_steps = gmp_engine.SYMMETRIES[symmetry_name] if symmetry_name is not None else ()
+
+    moved_x, moved_y, moved_w, moved_h = gmp_symmetric.transform_rect((x, y, w, h), symmetry_steps)
+    translation = (target_x - moved_x, target_y - moved_y, target_z - z)
+    steps = symmetry_steps + ( (gmp_engine.TRANSLATE, translation), )
+    return symmetry_steps, steps, (target_x, target_y, moved_w, moved_h)
+
+def check_stamp(region, target, target_rect):
+    """Get the error message for a region/target out of the maps, None if they fit"""
+    x, y, z, w, h, d = region
+    if (w < 1 or h < 1 or d < 1 or x < 0 or y < 0 or z < 0
+        or x + w > 256 or y + h > 256 or z + d > MAP_LEVELS):
+        return f"region x = {x}, y = {y}, z = {z}, w = {w}, h = {h}, d = {d} out of the source map"
+    target_x, target_y, target_w, target_h = target_rect
+    target_z = target[2]
+    if (target_x < 0 or target_y < 0 or target_z < 0
+        or target_x + target_w > 256 or target_y + target_h > 256 or target_z + d > MAP_LEVELS):
+        return f"target x = {target_x}, y = {target_y}, z = {target_z} puts the region out of the target map"
+    return None
+
+def stamp_layers(source_layers, target_layers, region, target, symmetry_name=None, cache=None):
+    """Copy the blocks of the region of 'source_layers' into a copy of 'target_layers'
+    (lists of the 8 z levels). Returns the new target levels."""
+    x, y, z, w, h, d = region
+    symmetry_steps, _, target_rect = get_stamp_steps(region, target, symmetry_name)
+    if cache is None:
+        cache = dict()
+
+    new_layers = list(target_layers)
+    for level in range(d):
+        blocks = gmp_symmetric.get_rect_blocks(source_layers[z + level], (x, y, w, h))
+        blocks = gmp_symmetric.transform_rect_blocks(blocks, w, h, symmetry_steps, cache)
+
+        rows = gmp_symmetric.get_layer_rows(new_layers[target[2] + level])
+        gmp_symmetric.stamp_rect_rows(rows, blocks, target_rect)
+        new_layers[target[2] + level] = b"".join(rows)
+
+    return new_layers
+
+def is_light_in_box(light_data, rect, z, d):
+    light_z = int.from_bytes(light_data[8:10], 'little')
+    return (z*128 <= light_z < (z + d)*128 and gmp_symmetric.is_point_in_rect(light_data, rect))
+
+def stamp_records(source_records, target_records, is_in_source, is_in_target, transform):
+    """Replace the zones/lights/objects inside the target box by the transformed ones
+    inside the source region"""
+    if source_records is None and target_records is None:
+        return None
+    new_records = [ data for data in target_records or [] if not is_in_target(data) ]
+    new_records += transform([ data for data in source_records or [] if is_in_source(data) ])
+    return new_records
+
+def stamp_gmp(source_path, source_infos, region, target_path, target_infos, target, output_path, symmetry_name=None):
+    """Copy a region of the source map (blocks, zones, lights and objects) into the target
+    map at 'target', writing the result to 'output_path'"""
+    source_chunk = gmp_blocks.get_map_chunk_name(source_infos)
+    target_chunk = gmp_blocks.get_map_chunk_name(target_infos)
+    if source_chunk is None or target_chunk is None:
+        print("Error: both maps must have block data (UMAP, DMAP or CMAP).")
+        return -2
+
+    _, steps, target_rect = get_stamp_steps(region, target, symmetry_name)
+    error = check_stamp(region, target, target_rect)
+    if error is not None:
+        print(f"Error: {error}.")
+        return -1
+
+    x, y, z, w, h, d = region
+    print(f"Copying {w} x {h} x {d} blocks to x = {target[0]}, y = {target[1]}, z = {target[2]}...")
+    source_layers = gmp_blocks.read_umap_layers(source_path, source_infos)
+    target_layers = gmp_blocks.read_umap_layers(target_path, target_infos)
+    if source_layers is None or target_layers is None:
+        return -1
+    source_layers = [ bytes(layer_data) for layer_data in source_layers ]
+    target_layers = [ bytes(layer_data) for layer_data in target_layers ]
+
+    new_chunks = dict()
+    new_chunks[target_chunk] = stamp_layers(source_layers, target_layers, region, target, symmetry_name)
+
+    source_zones = rotate_gmp.get_zones_info_data(source_path, source_infos)
+    source_lights = rotate_gmp.get_light_info_data(source_path, source_infos)
+    source_objects = rotate_gmp.get_objects_info_data(source_path, source_infos)
+    target_zones = rotate_gmp.get_zones_info_data(target_path, target_infos)
+    target_lights = rotate_gmp.get_light_info_data(target_path, target_infos)
+    target_objects = rotate_gmp.get_objects_info_data(target_path, target_infos)
+
+    rect = (x, y, w, h)
+    zones = stamp_records(source_zones, target_zones,
+                          lambda data: gmp_symmetric.is_zone_in_rect(data, rect),
+                          lambda data: gmp_symmetric.is_zone_in_rect(data, target_rect),
+                          lambda zones: gmp_engine.transform_zones_and_lights(zones, None, steps)[0])
+    lights = stamp_records(source_lights, target_lights,
+                           lambda data: is_light_in_box(data, rect, z, d),
+                           lambda data: is_light_in_box(data, target_rect, target[2], d),
+                           lambda lights: gmp_engine.transform_zones_and_lights(None, lights, steps)[1])
+    objects = stamp_records(source_objects, target_objects,
+                            lambda data: gmp_symmetric.is_point_in_rect(data, rect),
+                            lambda data: gmp_symmetric.is_point_in_rect(data, target_rect),
+                            lambda objects: gmp_engine.transform_objects(objects, steps))
+
+    if zones is not None:
+        new_chunks["ZONE"] = zones
+    if lights is not None:
+        new_chunks["LGHT"] = lights
+    if objects is not None:
+        new_chunks["MOBJ"] = objects
+
+    print(f"Writing {output_path}")
+    if gmp_writer.write_gmp(target_path, output_path, target_infos, new_chunks, {target_chunk: "UMAP"}) != 0:
+        return -1
+
+    print("\nSuccess! Region copied.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(PROGRAM_NAME, description="Copy a region of blocks from a map into another one")
+    parser.add_argument("source_path")
+    parser.add_argument("target_path")
+    parser.add_argument("--region", type=int, nargs=6, required=True, metavar=("X", "Y", "Z", "W", "H", "D"), help="region of the source map: w x h blocks on d z levels")
+    parser.add_argument("--to", type=int, nargs=3, required=True, metavar=("X", "Y", "Z"), help="position of the region in the target map")
+    parser.add_argument("--symmetry", help=f"transform the region with any of {', '.join(gmp_engine.SYMMETRIES)}")
+    parser.add_argument("-o", "--output", help="map to write (default: [target]_stamped.gmp)")
+    args = parser.parse_args()
+
+    source_path, target_path = [ ROOT_DIR / path if ("\\" not in path and "/" not in path) else Path(path)
+                                 for path in (args.source_path, args.target_path) ]
+    if (not source_path.exists() or not target_path.exists()):
+        print("File not found.")
+        sys.exit(-1)
+
+    if args.symmetry is not None and args.symmetry not in gmp_engine.SYMMETRIES:
+        print(f"Error: unknown symmetry '{args.symmetry}'. Use any of: {', '.join(gmp_engine.SYMMETRIES)}")
+        sys.exit(-1)
+
+    if args.output:
+        output_path = Path(args.output)
+    else:
+        output_path = target_path.parent / f"{gmp_engine.get_filename(target_path)}_stamped.gmp"
+
+    source_infos = rotate_gmp.detect_headers_and_get_chunks(source_path)
+    target_infos = rotate_gmp.detect_headers_and_get_chunks(target_path)
+    if stamp_gmp(source_path, source_infos, tuple(args.region), target_path, target_infos, tuple(args.to),
+                 output_path, args.symmetry) != 0:
+        sys.exit(-1)
+    return
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+from pathlib import Path
+from collections import Counter
+from array import array
+import argparse
+import contextlib
+import json
+import sys
+import os
+
+import rotate_gmp
+import gmp_blocks
+
+PROGRAM_NAME = os.path.basename(sys.argv[0])
+
+BLOCK_INFO_SIZE = gmp_blocks.BLOCK_INFO_SIZE
+LAYER_INFO_SIZE = gmp_blocks.LAYER_INFO_SIZE
+
+BLOCK_TYPES = ["air", "road", "pavement", "field"]
+ARROW_NAMES = ["left", "right", "up", "down"]     # bits 0 to 3 of each nibble
+ROTATION_NAMES = ["0", "90", "180", "270"]
+
+# The fields of all blocks are counted at once: a Counter of the raw words/bytes of a
+# whole z level (the same values repeat a lot), then each bitfield is summed up from the
+# few different values.
+
+def fold_counter(counter, get_key):
+    """Sum the counts of a Counter of raw values by the key of each value"""
+    folded = Counter()
+    for value, count in counter.items():
+        key = get_key(value)
+        if key is not None:
+            folded[key] += count
+    return folded
+
+def sorted_dict(counter):
+    return { str(key) : counter[key] for key in sorted(counter) }
+
+def get_layer_words(layer_data):
+    """Get the 6 UInt16 words of each block of the z level:
+    left, right, top, bottom, lid, arrows + slope"""
+    words = array('H')
+    words.frombytes(layer_data)
+    if sys.byteorder == 'big':
+        words.byteswap()
+    return words
+
+def count_non_empty_blocks(layer_data):
+    """Count the blocks with any nonzero byte: the 12 bytes of every block are or-ed
+    together as integers, then the zero bytes are the empty blocks"""
+    non_empty = 0
+    for i in range(BLOCK_INFO_SIZE):
+        non_empty |= int.from_bytes(layer_data[i::BLOCK_INFO_SIZE], 'little')
+    return 256*256 - non_empty.to_bytes(256*256, 'little').count(0)
+
+def get_tile_stats(word_counter, is_lid):
+    """Get the histograms of the bitfields of the lid or side words (tiles not 0 only)"""
+    word_counter = Counter({ word : count for word, count in word_counter.items() if word % 1024 != 0 })
+
+    stats = dict()
+    stats["tiles"] = sorted_dict(fold_counter(word_counter, lambda word: word % 1024))
+    if is_lid:
+        stats["lighting"] = sorted_dict(fold_counter(word_counter, lambda word: (word >> 10) % 4))
+    else:
+        stats["wall"] = sorted_dict(fold_counter(word_counter, lambda word: (word >> 10) % 2))
+        stats["bullet_wall"] = sorted_dict(fold_counter(word_counter, lambda word: (word >> 11) % 2))
+    stats["flat"] = sorted_dict(fold_counter(word_counter, lambda word: (word >> 12) % 2))
+    stats["flip"] = sorted_dict(fold_counter(word_counter, lambda word: (word >> 13) % 2))
+    stats["rotation"] = { ROTATION_NAMES[rotation] : count for rotation, count in
+                          sorted(fold_counter(word_counter, lambda word: word >> 14).items()) }
+    return stats
+
+def get_map_stats(layers):
+    """Get the statistics of the map blocks as a dict ready for JSON"""
+    side_words = Counter()
+    lid_words = Counter()
+    arrows_bytes = Counter()
+    slope_bytes = Counter()
+    layer_stats = []
+
+    for z, layer_data in enumerate(layers):
+        layer_data = bytes(layer_data)
+        words = get_layer_words(layer_data)
+
+        for side in range(4):
+            side_words.update(words[side::6])
+        lid_words.update(words[4::6])
+        arrows_bytes.update(layer_data[10::BLOCK_INFO_SIZE])
+        slope_bytes.update(layer_data[11::BLOCK_INFO_SIZE])
+
+        non_empty_blocks = count_non_empty_blocks(layer_data)
+        layer_stats.append({ "z" : z,
+                             "blocks" : non_empty_blocks,
+                             "occupancy" : round(non_empty_blocks / (256*256), 4) })
+
+    arrows = dict()
+    for color, shift in (("green", 0), ("red", 4)):
+        arrows[color] = { ARROW_NAMES[bit] : sum(count for byte, count in arrows_bytes.items() if (byte >> (shift + bit)) % 2)
+                          for bit in range(4) }
+
+    stats = dict()
+    stats["blocks"] = sum(layer["blocks"] for layer in layer_stats)
+    stats["layers"] = layer_stats
+    stats["block_types"] = { BLOCK_TYPES[block_type] : count for block_type, count in
+                             sorted(fold_counter(slope_bytes, lambda byte: byte % 4).items()) }
+    stats["slope_types"] = sorted_dict(fold_counter(slope_bytes, lambda byte: byte >> 2))
+    stats["arrows"] = arrows
+    stats["lid"] = get_tile_stats(lid_words, is_lid=True)
+    stats["sides"] = get_tile_stats(side_words, is_lid=False)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(PROGRAM_NAME, description="Print the statistics of a map as JSON")
+    parser.add_argument("gmp_path")
+    parser.add_argument("-o", "--output", help="JSON file to write (default: print it)")
+    args = parser.parse_args()
+
+    gmp_path = Path(args.gmp_path)
+    if (not gmp_path.exists()):
+        print("File not found.")
+        sys.exit(-1)
+
+    # keep the messages of the gmp reader out of the printed JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        chunk_infos = rotate_gmp.detect_headers_and_get_chunks(gmp_path)
+        layers = gmp_blocks.read_umap_layers(gmp_path, chunk_infos)
+        if layers is None:
+            print("Error: the map has no block data.")
+            sys.exit(-1)
+
+        stats = { "map" : gmp_path.name }
+        stats.update(get_map_stats(layers))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(stats, file, indent=2)
+        print(f"Statistics written to {args.output}")
+    else:
+        print(json.dumps(stats, indent=2))
+    return
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+from pathlib import Path
+import argparse
+import sys
+import os
+
+import rotate_gmp
+import flip_gmp
+import gmp_writer
+import gmp_blocks
+import gmp_engine
+
+PROGRAM_NAME = os.path.basename(sys.argv[0])
+ROOT_DIR = Path(__file__).parent
+
+BLOCK_INFO_SIZE = gmp_blocks.BLOCK_INFO_SIZE
+ZONE_TYPE_COORDS_DATA_SIZE = rotate_gmp.ZONE_TYPE_COORDS_DATA_SIZE
+MAX_ZONE_NAME_LENGTH = 255
+
+# Each group is the list of symmetries (see 'gmp_engine.SYMMETRIES') applied to the source
+# rectangle (x, y, w, h), plus the default source: the part of the map its copies fill.
+GROUPS = {
+    "rotation_4" : ( ["rotated_90", "rotated_180", "rotated_270"], (0, 0, 128, 128) ),
+    "rotation_2" : ( ["rotated_180"], (0, 0, 256, 128) ),
+    "mirror_x" : ( ["flip_x"], (0, 0, 128, 256) ),
+    "mirror_y" : ( ["flip_y"], (0, 0, 256, 128) ),
+    "mirror_xy" : ( ["flip_x", "flip_y", "rotated_180"], (0, 0, 128, 128) ),
+}
+
+# The blocks of the source rectangle are taken once per z level, transformed as a small
+# grid (each different block once, then reordered with an index table) and stamped in
+# the destination rectangle, which is the source rectangle moved by the same symmetry.
+# Every z level of the output is then joined from its rows at once.
+
+def get_rect_indexes(step_type, value, w, h):
+    """Get the index (y*w + x) of the source block for each block of a w x h grid after
+    a rotation/flip, same as 'rotate_gmp.get_rotated_layer_indexes'.
+
+    Returns the indexes and the new width and height of the grid.
+    """
+    if step_type == gmp_engine.ROTATE:
+        if value == 90:
+            return [ (h - 1 - x)*w + y for y in range(w) for x in range(h) ], h, w
+        elif value == 180:
+            return [ (h - 1 - y)*w + w - 1 - x for y in range(h) for x in range(w) ], w, h
+        elif value == 270:
+            return [ x*w + w - 1 - y for y in range(w) for x in range(h) ], h, w
+    else:
+        if value == flip_gmp.FLIP_X:
+            return [ y*w + w - 1 - x for y in range(h) for x in range(w) ], w, h
+        elif value == flip_gmp.FLIP_Y:
+            return [ (h - 1 - y)*w + x for y in range(h) for x in range(w) ], w, h
+    print(f"Error: wrong symmetry step: {step_type}, {value}")
+    sys.exit(-1)
+
+def transform_rect_blocks(blocks, w, h, steps, cache):
+    """Apply the rotations/flips of 'steps' to a w x h grid of blocks (list of 12 bytes).
+    'cache' keeps the transformed blocks of each step between z levels."""
+    for step in steps:
+        step_type, value = step
+        step_cache = cache.setdefault(step, dict())
+        new_blocks = []
+        for block_data in blocks:
+            new_block_data = step_cache.get(block_data)
+            if new_block_data is None:
+                if step_type == gmp_engine.ROTATE:
+                    new_block_data = rotate_gmp.rotate_block(block_data, value)
+                else:
+                    new_block_data = flip_gmp.flip_block(block_data, value)
+                step_cache[block_data] = new_block_data
+            new_blocks.append(new_block_data)
+
+        indexes, w, h = get_rect_indexes(step_type, value, w, h)
+        blocks = [ new_blocks[idx] for idx in indexes ]
+    return blocks
+
+def transform_rect(rect, steps):
+    """Move the rectangle (x, y, w, h) of blocks with the symmetry, like a zone"""
+    for step_type, value in steps:
+        if step_type == gmp_engine.ROTATE:
+            rect = rotate_gmp.get_rotated_zone_rect((None,) + rect, value)
+        else:
+            rect = flip_gmp.get_flipped_zone_rect((None,) + rect, value)
+    return rect
+
+def is_rect_overlapping(rect_1, rect_2):
+    x1, y1, w1, h1 = rect_1
+    x2, y2, w2, h2 = rect_2
+    return (x1 < x2 + w2 and x2 < x1 + w1 and y1 < y2 + h2 and y2 < y1 + h1)
+
+def is_zone_in_rect(zone_data, rect):
+    x, y, w, h = rect
+    return (x <= zone_data[1] and zone_data[1] + zone_data[3] <= x + w
+            and y <= zone_data[2] and zone_data[2] + zone_data[4] <= y + h)
+
+def is_point_in_rect(data, rect):
+    """Check the fix16 (x, y) of a light (offset 4) or a map object (offset 0)"""
+    x, y, w, h = rect
+    offset = 4 if len(data) == rotate_gmp.LIGHT_INFO_SIZE else 0
+    point_x = int.from_bytes(data[offset : offset + 2], 'little')
+    point_y = int.from_bytes(data[offset + 2 : offset + 4], 'little')
+    return (x*128 <= point_x < (x + w)*128 and y*128 <= point_y < (y + h)*128)
+
+def get_rect_blocks(layer_data, rect):
+    x, y, w, h = rect
+    blocks = []
+    for row_y in range(y, y + h):
+        row_offset = (row_y*256 + x)*BLOCK_INFO_SIZE
+        row = layer_data[row_offset : row_offset + w*BLOCK_INFO_SIZE]
+        blocks += [ row[i : i + BLOCK_INFO_SIZE] for i in range(0, w*BLOCK_INFO_SIZE, BLOCK_INFO_SIZE) ]
+    return blocks
+
+def get_layer_rows(layer_data):
+    row_size = 256*BLOCK_INFO_SIZE
+    return [ layer_data[y*row_size : (y + 1)*row_size] for y in range(256) ]
+
+def stamp_rect_rows(rows, blocks, rect):
+    """Replace the rectangle (x, y, w, h) of the rows of a z level by a w x h grid of blocks"""
+    x, y, w, h = rect
+    for row_y in range(h):
+        row = rows[y + row_y]
+        rows[y + row_y] = ( row[:x*BLOCK_INFO_SIZE]
+                            + b"".join(blocks[row_y*w : (row_y + 1)*w])
+                            + row[(x + w)*BLOCK_INFO_SIZE:] )
+    return
+
+def build_symmetric_layer(layer_data, source_rect, copies, cache):
+    """Stamp the transformed copies of the source rectangle in a z level.
+
+    'copies' is a list of (symmetry name, steps, destination rectangle). Returns the new
+    layer as bytes.
+    """
+    rows = get_layer_rows(layer_data)
+    source_blocks = get_rect_blocks(layer_data, source_rect)
+
+    for _, steps, rect in copies:
+        blocks = transform_rect_blocks(source_blocks, source_rect[2], source_rect[3], steps, cache)
+        stamp_rect_rows(rows, blocks, rect)
+
+    return b"".join(rows)
+
+def get_symmetric_copies(group_name, source_rect):
+    """Get the (symmetry name, steps, destination rectangle) of each copy of the source rectangle.
+
+    Returns the copies and a list of error messages (empty if the copies fit together).
+    """
+    symmetry_names = GROUPS[group_name][0]
+    copies = [ (symmetry_name, gmp_engine.SYMMETRIES[symmetry_name], transform_rect(source_rect, gmp_engine.SYMMETRIES[symmetry_name]))
+               for symmetry_name in symmetry_names ]
+
+    errors = []
+    rects = [("source", source_rect)] + [ (symmetry_name, rect) for symmetry_name, _, rect in copies ]
+    for i in range(len(rects)):
+        for j in range(i + 1, len(rects)):
+            if is_rect_overlapping(rects[i][1], rects[j][1]):
+                errors.append(f"{rects[i][0]} {rects[i][1]} overlaps {rects[j][0]} {rects[j][1]}")
+    return copies, errors
+
+def replicate_records(records, source_rect, copies, is_in_rect, transform, rename=None):
+    """Keep the zones/lights/objects outside the copies, then add the transformed copies
+    of the ones inside the source rectangle, renamed by 'rename(data, symmetry name)' if given"""
+    if records is None:
+        return None
+    new_records = [ data for data in records
+                    if not any(is_in_rect(data, rect) for _, _, rect in copies) ]
+    source_records = [ data for data in records if is_in_rect(data, source_rect) ]
+    for symmetry_name, steps, _ in copies:
+        copied_records = transform(source_records, steps)
+        if rename is not None:
+            copied_records = [ rename(data, symmetry_name) for data in copied_records ]
+        new_records += copied_records
+    return new_records
+
+def get_zone_rect(zone_data):
+    return tuple(zone_data[1:5])
+
+def remove_overlapping_zones(zones, copies):
+    """Remove the zones partly inside the rectangle of a copy: they would cover blocks of
+    the copy and of the rest of the map. Returns the kept zones and the removed ones."""
+    if zones is None:
+        return None, []
+    kept_zones = []
+    removed_zones = []
+    for zone_data in zones:
+        if any(is_rect_overlapping(get_zone_rect(zone_data), rect) and not is_zone_in_rect(zone_data, rect)
+               for _, _, rect in copies):
+            removed_zones.append(zone_data)
+        else:
+            kept_zones.append(zone_data)
+    return kept_zones, removed_zones
+
+def rename_zone(zone_data, symmetry_name, used_names):
+    """Name a copy of a zone <name>_<symmetry>, as the copies of the mission script
+    declarations, with a number if the name is taken. The name is cut to fit in 255 bytes."""
+    name_data = bytes(zone_data[ZONE_TYPE_COORDS_DATA_SIZE + 1 :])
+    i = 1
+    while True:
+        suffix = f"_{symmetry_name}" if i == 1 else f"_{symmetry_name}_{i}"
+        new_name_data = name_data[:MAX_ZONE_NAME_LENGTH - len(suffix)] + suffix.encode('ascii')
+        if new_name_data not in used_names:
+            break
+        i += 1
+    used_names.add(new_name_data)
+    return bytes(zone_data[:ZONE_TYPE_COORDS_DATA_SIZE]) + bytes([len(new_name_data)]) + new_name_data
+
+def build_symmetric_gmp(gmp_path, chunk_infos, group_name, source_rect, output_path):
+    map_chunk = gmp_blocks.get_map_chunk_name(chunk_infos)
+    if map_chunk is None:
+        print("Error: the map has no block data.")
+        return -2
+
+    x, y, w, h = source_rect
+    if (w < 1 or h < 1 or x < 0 or y < 0 or x + w > 256 or y + h > 256):
+        print(f"Error: source x = {x}, y = {y}, w = {w}, h = {h} out of the map.")
+        return -1
+
+    copies, errors = get_symmetric_copies(group_name, source_rect)
+    if errors:
+        print(f"Error: the copies of the source overlap:")
+        for error in errors:
+            print(f"  {error}")
+        return -1
+
+    layers = gmp_blocks.read_umap_layers(gmp_path, chunk_infos)
+    if layers is None:
+        return -1
+
+    print(f"Building {group_name} map from x = {x}, y = {y}, w = {w}, h = {h}...")
+    new_chunks = dict()
+    cache = dict()
+    new_chunks[map_chunk] = [ build_symmetric_layer(bytes(layer_data), source_rect, copies, cache) for layer_data in layers ]
+
+    zones, removed_zones = remove_overlapping_zones(rotate_gmp.get_zones_info_data(gmp_path, chunk_infos), copies)
+    if removed_zones:
+        print(f"Warning: {len(removed_zones)} zones partly inside the copies removed:")
+        for zone_data in removed_zones:
+            print(f"  Zone '{rotate_gmp.get_zone_name(zone_data)}': (x, y, w, h) = {get_zone_rect(zone_data)}")
+
+    used_names = { bytes(zone_data[ZONE_TYPE_COORDS_DATA_SIZE + 1 :]) for zone_data in zones or [] }
+    zones = replicate_records(zones, source_rect, copies, is_zone_in_rect,
+                              lambda zones, steps: gmp_engine.transform_zones_and_lights(zones, None, steps)[0],
+                              lambda zone_data, symmetry_name: rename_zone(zone_data, symmetry_name, used_names))
+    lights = replicate_records(rotate_gmp.get_light_info_data(gmp_path, chunk_infos), source_rect, copies, is_point_in_rect,
+                               lambda lights, steps: gmp_engine.transform_zones_and_lights(None, lights, steps)[1])
+    objects = replicate_records(rotate_gmp.get_objects_info_data(gmp_path, chunk_infos), source_rect, copies, is_point_in_rect,
+                                gmp_engine.transform_objects)
+    if zones is not None:
+        new_chunks["ZONE"] = zones
+    if lights is not None:
+        new_chunks["LGHT"] = lights
+    if objects is not None:
+        new_chunks["MOBJ"] = objects
+
+    print(f"Writing {output_path}")
+    if gmp_writer.write_gmp(gmp_path, output_path, chunk_infos, new_chunks, {map_chunk: "UMAP"}) != 0:
+        return -1
+
+    print(f"\nSuccess! {len(copies)} copies of the source stamped.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(PROGRAM_NAME, description="Build a symmetric map from a part of it")
+    parser.add_argument("gmp_path")
+    parser.add_argument("group", help=f"any of {', '.join(GROUPS)}")
+    parser.add_argument("--source", type=int, nargs=4, metavar=("X", "Y", "W", "H"), help="source rectangle of blocks (default: the quadrant/half of the group)")
+    args = parser.parse_args()
+
+    if args.group not in GROUPS:
+        print(f"Error: unknown group '{args.group}'. Use any of: {', '.join(GROUPS)}")
+        sys.exit(-1)
+
+    if ("\\" not in args.gmp_path and "/" not in args.gmp_path):
+        gmp_path = ROOT_DIR / args.gmp_path
+    else:
+        gmp_path = Path(args.gmp_path)
+
+    if (not gmp_path.exists()):
+        print("File not found.")
+        sys.exit(-1)
+
+    source_rect = tuple(args.source) if args.source else GROUPS[args.group][1]
+    output_path = gmp_path.parent / f"{gmp_engine.get_filename(gmp_path)}_{args.group}.gmp"
+
+    chunk_infos = rotate_gmp.detect_headers_and_get_chunks(gmp_path)
+    if build_symmetric_gmp(gmp_path, chunk_infos, args.group, source_rect, output_path) != 0:
+        sys.exit(-1)
+    return
+
+if __name__ == "__main__":
+    main()
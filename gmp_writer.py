@@ -0,0 +1,173 @@
+import os
+
+COPY_BUFFER_SIZE = 1024*1024
+
+def get_chunk_list(chunk_infos):
+    """Get the chunks found in the gmp file as a list of (name, data offset, size),
+    in the same order as they are in the file"""
+    chunk_list = [ (chunk_name, offset, size) for chunk_name, (offset, size) in chunk_infos.items() if offset is not None ]
+    chunk_list.sort(key=lambda chunk: chunk[1])
+    return chunk_list
+
+def copy_range(source_fd, output_fd, offset, count):
+    """Copy 'count' bytes starting at 'offset' of the source file to the current position
+    of the output file.
+
+    The data is copied inside the kernel with 'copy_file_range' or 'sendfile' when the
+    platform supports it, or else through a buffer.
+
+    Returns False if the source file ends before 'count' bytes.
+    """
+    if count <= 0:
+        return True
+
+    if hasattr(os, "copy_file_range"):
+        try:
+            while count > 0:
+                copied = os.copy_file_range(source_fd, output_fd, count, offset_src=offset)
+                if copied == 0:
+                    break
+                offset += copied
+                count -= copied
+        except OSError:
+            pass    # e.g. not supported between these file systems, try the next method
+
+    if count > 0 and hasattr(os, "sendfile"):
+        try:
+            while count > 0:
+                copied = os.sendfile(output_fd, source_fd, offset, count)
+                if copied == 0:
+                    break
+                offset += copied
+                count -= copied
+        except OSError:
+            pass    # e.g. macOS only sends to sockets
+
+    while count > 0:
+        os.lseek(source_fd, offset, os.SEEK_SET)
+        data = os.read(source_fd, min(count, COPY_BUFFER_SIZE))
+        if not data:
+            print(f"Error: unexpected end of file while copying {count} bytes")
+            return False
+        write_all(output_fd, data)
+        offset += len(data)
+        count -= len(data)
+    return True
+
+def write_all(output_fd, data):
+    view = memoryview(data)
+    while len(view) > 0:
+        written = os.write(output_fd, view)
+        view = view[written:]
+
+def write_chunks(source_fd, file_size, output_fd, chunk_list, new_chunks, renamed_chunks):
+    """Write the chunks of the source file to the output file, with the data of 'new_chunks'
+    (see 'write_gmp'). Returns False if the source file ends before its last chunk."""
+    position = 0    # position in source file not copied yet
+    complete = True
+
+    for chunk_name, offset, size in chunk_list:
+        if chunk_name not in new_chunks:
+            continue    # copied later along with its neighbours
+
+        # everything up to the chunk header
+        if not copy_range(source_fd, output_fd, position, offset - 8 - position):
+            complete = False
+            break
+
+        write_all(output_fd, renamed_chunks.get(chunk_name, chunk_name).encode('ascii'))
+
+        data = new_chunks[chunk_name]
+
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            parts = [data]
+        else:
+            parts = data
+
+        if isinstance(parts, (list, tuple)):
+            new_size = sum(len(part) for part in parts)
+            write_all(output_fd, int.to_bytes(new_size, 4, 'little'))
+            for part in parts:
+                write_all(output_fd, part)
+        else:
+            # generated data: the size is only known at the end
+            size_position = os.lseek(output_fd, 0, os.SEEK_CUR)
+            write_all(output_fd, int.to_bytes(size, 4, 'little'))
+            new_size = 0
+            for part in parts:
+                write_all(output_fd, part)
+                new_size += len(part)
+            if new_size != size:
+                os.lseek(output_fd, size_position, os.SEEK_SET)
+                write_all(output_fd, int.to_bytes(new_size, 4, 'little'))
+                os.lseek(output_fd, size_position + 4 + new_size, os.SEEK_SET)
+
+        position = offset + size
+
+    if complete:
+        complete = copy_range(source_fd, output_fd, position, file_size - position)
+
+    if not complete:
+        return False
+
+    found_chunks = [ chunk_name for chunk_name, _, _ in chunk_list ]
+    for chunk_name, data in new_chunks.items():
+        if chunk_name in found_chunks:
+            continue
+        parts = [data] if isinstance(data, (bytes, bytearray, memoryview)) else list(data)
+        write_all(output_fd, renamed_chunks.get(chunk_name, chunk_name).encode('ascii'))
+        write_all(output_fd, int.to_bytes(sum(len(part) for part in parts), 4, 'little'))
+        for part in parts:
+            write_all(output_fd, part)
+    return True
+
+def write_gmp(gmp_path, output_path, chunk_infos, new_chunks, renamed_chunks=None):
+    """Write a copy of the gmp file with the data of some chunks replaced.
+
+    'new_chunks' maps a chunk name (e.g. "UMAP") to its new data: bytes, a list of bytes
+    or any other iterable of bytes (e.g. a generator of UMAP levels, so the data can be
+    written while it's being generated).
+
+    'renamed_chunks' optionally maps a chunk name to the name written in the output, e.g.
+    {"DMAP": "UMAP"} when a decompressed map replaces the compressed one.
+
+    The chunks are written in the same order of the source file. Every other chunk is
+    copied straight from the source file, so each byte of the output is written once.
+    The new chunks not found in the source file (e.g. ZONE) are added at the end.
+
+    The output is written to a temporary file next to it, which replaces the output
+    once complete: the output can be the source file itself, an existing output is kept
+    if anything fails, and an output hard-linked to the output cache (see 'gmp_cache')
+    isn't overwritten.
+
+    Returns 0, or -1 if the source file is truncated (nothing is written then).
+    """
+    if renamed_chunks is None:
+        renamed_chunks = dict()
+
+    temp_path = f"{os.fspath(output_path)}.{os.getpid()}.tmp"
+
+    with open(gmp_path, 'rb') as source_file:
+        source_fd = source_file.fileno()
+        file_size = os.fstat(source_fd).st_size
+        chunk_list = get_chunk_list(chunk_infos)
+
+        # the chunks copied as they are must be whole in the source file
+        for chunk_name, offset, size in chunk_list:
+            if chunk_name not in new_chunks and offset + size > file_size:
+                print(f"Error: {gmp_path} is truncated, chunk {chunk_name} ends after {file_size} bytes")
+                return -1
+
+        try:
+            with open(temp_path, 'wb', buffering=0) as output_file:
+                complete = write_chunks(source_fd, file_size, output_file.fileno(), chunk_list, new_chunks, renamed_chunks)
+        except BaseException:
+            os.remove(temp_path)    # e.g. an error while the new chunks were generated
+            raise
+
+    if not complete:
+        os.remove(temp_path)
+        return -1
+
+    os.replace(temp_path, output_path)
+    return 0
@@ -28,6 +28,8 @@ MAP_MAX_X = 256
 MAP_MAX_Y = 256
 
 DOOR_FACES = ["BOTTOM", "LEFT", "TOP", "RIGHT"]
+
+NO_TRANSLATION = (0, 0, 0)     # (dx, dy, dz) in blocks
 #DOOR_FACES = ["RIGHT", "TOP", "LEFT", "BOTTOM"]
 
 @verify(UNIQUE)
@@ -62,7 +64,17 @@ class Cmd(Enum):
 
 # Rotation stuff
 
-def rotate_tuple(coords: tuple, rotation_angle: int) -> tuple:
+def translate_tuple(coords: tuple, translation: tuple) -> tuple:
+    """Move the x, y (and z) coordinates of a tuple by (dx, dy, dz) blocks"""
+    coords_list = list(coords)
+    coords_list[0] += translation[0]
+    coords_list[1] += translation[1]
+    if len(coords_list) >= 3:
+        coords_list[2] += translation[2]
+    return tuple(coords_list)
+
+def rotate_tuple(coords: tuple, rotation_angle: int, translation: tuple = NO_TRANSLATION) -> tuple:
+    """Rotate the coordinates of a tuple, then move them by 'translation'"""
     # (123, 125)
     # (123, 125, 2)
     # (123.50, 125.50)
@@ -88,14 +100,15 @@ def rotate_tuple(coords: tuple, rotation_angle: int) -> tuple:
         coords_list[1] = MAP_MAX_X - coords[0] - offset
         if len(coords_list) == 5:   # swap width and height
             coords_list[3], coords_list[4] = coords_list[4], coords_list[3]
-    return tuple(coords_list)
+    return translate_tuple(coords_list, translation)
 
 def rotate_params(cmd: list, 
                   rotation_angle: int, 
                   rotation_param_indexes: list[int] | None = [], 
                   width_height_tuple_indexes: list[int] | None = [], 
                   blacklist_indexes: list[int] | None = [], 
-                  reverse_rot_param: bool | None = False
+                  reverse_rot_param: bool | None = False,
+                  translation: tuple = NO_TRANSLATION
                   ):
     for i, param in enumerate(cmd):
         if i in blacklist_indexes:
@@ -118,7 +131,7 @@ def rotate_params(cmd: list,
             # rotate position coordinates
             if i not in width_height_tuple_indexes:
                 # xyz coordinates
-                cmd[i] = rotate_tuple(param, rotation_angle)
+                cmd[i] = rotate_tuple(param, rotation_angle, translation)
             else:
                 # width height
                 assert len(param) == 2
@@ -148,7 +161,9 @@ def rotate_face(old_face: str, rotation_angle: int):
         sys.exit(-1)
     index = DOOR_FACES.index(old_face)
 
-    if rotation_angle == 90:
+    if rotation_angle == 0:     # only translated
+        new_array = DOOR_FACES
+    elif rotation_angle == 90:
         new_array = shift_array(DOOR_FACES, 1)
     elif rotation_angle == 180:
         new_array = shift_array(DOOR_FACES, 2)
@@ -485,7 +500,7 @@ def read_line(line, *args) -> list:
 
 
 
-def rotate_dec_opcode(line: str, rotation_angle: int):
+def rotate_dec_opcode(line: str, rotation_angle: int, translation: tuple = NO_TRANSLATION):
     
     new_line = line
     
@@ -496,7 +511,7 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
     if "PLAYER_PED" in line_uppercase:
         # PLAYER_PED p1 = (97.50, 73.50, 2.00) 5 1
         cmd = read_line(line, Cmd.OPCODE, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.COORD_XYZ_F, Cmd.PARAM_NUM, Cmd.ROTATION)
-        cmd_rot = rotate_params(cmd, rotation_angle, rotation_param_indexes=[4])
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation, rotation_param_indexes=[4])
         new_line = "{} {} = ({:.2f}, {:.2f}, {:.2f}) {} {}".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[2][2], cmd_rot[3], cmd_rot[4])
         return new_line
     
@@ -505,7 +520,7 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
         if len(line.strip().split(' ')) < 4:    # if not just declaring var
             return new_line
         cmd = read_line(line, Cmd.OPCODE, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.COORD_XYZ_F, Cmd.PARAM_NUM, Cmd.ROTATION, Cmd.PARAM_ENUM, Cmd.OPT_PARAM_ENUM)
-        cmd_rot = rotate_params(cmd, rotation_angle, rotation_param_indexes=[4])
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation, rotation_param_indexes=[4])
 
         if len(cmd_rot) == 6:
             if len(cmd_rot[2]) == 3:
@@ -529,11 +544,11 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
         num_parenthesis = line.count('(')
         if num_parenthesis == 1:
             cmd = read_line(line, Cmd.OPCODE, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.COORD_XY_F, Cmd.ROTATION, Cmd.VAR_NAME)
-            cmd_rot = rotate_params(cmd, rotation_angle, rotation_param_indexes=[3])
+            cmd_rot = rotate_params(cmd, rotation_angle, translation=translation, rotation_param_indexes=[3])
             new_line = "{} {} = ({:.2f}, {:.2f}) {} {}".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[3], cmd_rot[4])
         elif num_parenthesis == 2:
             cmd = read_line(line, Cmd.OPCODE, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.COORD_XY_F, Cmd.ROTATION, Cmd.VAR_NAME, Cmd.PARAM_ENUM, Cmd.COORD_XY_F, Cmd.ROTATION)
-            cmd_rot = rotate_params(cmd, rotation_angle, rotation_param_indexes=[3,7])
+            cmd_rot = rotate_params(cmd, rotation_angle, translation=translation, rotation_param_indexes=[3,7])
             new_line = "{} {} = ({:.2f}, {:.2f}) {} {} {} ({:.2f}, {:.2f}) {}".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[3], cmd_rot[4], cmd_rot[5], cmd_rot[6][0], cmd_rot[6][1], cmd_rot[7])
         
         return new_line
@@ -543,7 +558,7 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
             return new_line
         cmd = read_line(line, Cmd.OPCODE, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.COORD_XYZ_F, Cmd.PARAM_NUM, Cmd.ROTATION, Cmd.PARAM_ENUM)
         if len(cmd) > 2: # if not just declaring var
-            cmd_rot = rotate_params(cmd, rotation_angle, rotation_param_indexes=[4])
+            cmd_rot = rotate_params(cmd, rotation_angle, translation=translation, rotation_param_indexes=[4])
             if len(cmd_rot[2]) == 3:
                 new_line = "{} {} = ({:.2f}, {:.2f}, {:.2f}) {} {} {}".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[2][2], cmd_rot[3], cmd_rot[4], cmd_rot[5])
             else:
@@ -555,7 +570,7 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
             return new_line
         # l_e_1_guard_1 = CREATE_CHAR (157.50, 9.50, 3.00) 8 0 CRIMINAL END
         cmd = read_line(line, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.OPCODE, Cmd.COORD_XYZ_F, Cmd.PARAM_NUM, Cmd.ROTATION, Cmd.PARAM_ENUM)
-        cmd_rot = rotate_params(cmd, rotation_angle, rotation_param_indexes=[4])
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation, rotation_param_indexes=[4])
         if len(cmd_rot[2]) == 3:
             new_line = "{} = {} ({:.2f}, {:.2f}, {:.2f}) {} {} {} END".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[2][2], cmd_rot[3], cmd_rot[4], cmd_rot[5])
         else:
@@ -569,7 +584,7 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
             return new_line
         cmd = read_line(line, Cmd.OPCODE, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.COORD_XYZ_F, Cmd.ROTATION, Cmd.PARAM_ENUM, Cmd.OPT_PARAM_ENUM_OR_NUM)
         if len(cmd) > 2: # if not just declaring var
-            cmd_rot = rotate_params(cmd, rotation_angle, rotation_param_indexes=[3])
+            cmd_rot = rotate_params(cmd, rotation_angle, translation=translation, rotation_param_indexes=[3])
             if len(cmd_rot) == 5:
                 if len(cmd_rot[2]) == 3:
                     new_line = "{} {} = ({:.2f}, {:.2f}, {:.2f}) {} {}".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[2][2], cmd_rot[3], cmd_rot[4])
@@ -590,7 +605,7 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
         if type(cmd[-1]) == str and cmd[-1].upper() == "END":
             cmd.pop()
 
-        cmd_rot = rotate_params(cmd, rotation_angle, rotation_param_indexes=[3])
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation, rotation_param_indexes=[3])
         if len(cmd_rot) == 6:
             if len(cmd_rot[2]) == 3:
                 new_line = "{} = {} ({:.2f}, {:.2f}, {:.2f}) {} {} {} END".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[2][2], cmd_rot[3], cmd_rot[4], cmd_rot[5])
@@ -613,7 +628,7 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
         if cmd[-1].upper() == "END":
             cmd.pop()
 
-        cmd_rot = rotate_params(cmd, rotation_angle, rotation_param_indexes=[4])
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation, rotation_param_indexes=[4])
         
         if len(cmd_rot) == 6:
             if len(cmd_rot[2]) == 3:
@@ -631,7 +646,7 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
     elif "CREATE_SOUND" in line_uppercase:
         # sound28 = CREATE_SOUND (113.50, 123.50, 2.00) CHURCH_SINGING PLAY_FOREVER END
         cmd = read_line(line, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.OPCODE, Cmd.COORD_XYZ_F, Cmd.PARAM_ENUM, Cmd.PARAM_ENUM)
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
         new_line = "{} = {} ({:.2f}, {:.2f}, {:.2f}) {} {} END".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[2][2], cmd_rot[3], cmd_rot[4])
         return new_line
 
@@ -641,28 +656,28 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
             return new_line
         cmd = read_line(line, Cmd.OPCODE, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.COORD_XYZ_F, Cmd.PARAM_ENUM, Cmd.PARAM_ENUM)
         if len(cmd) > 2:
-            cmd_rot = rotate_params(cmd, rotation_angle)
+            cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
             new_line = "{} {} = ({:.2f}, {:.2f}, {:.2f}) {} {}".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[2][2], cmd_rot[3], cmd_rot[4])
         return new_line
 
     elif "RADIO_STATION" in line_uppercase:
         # RADIO_STATION radio1 = STATION_ZAIBATSU (247.50, 67.50)
         cmd = read_line(line, Cmd.OPCODE, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.PARAM_ENUM, Cmd.COORD_XY_F)
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
         new_line = "{} {} = {} ({:.2f}, {:.2f})".format(cmd_rot[0], cmd_rot[1], cmd_rot[2], cmd_rot[3][0], cmd_rot[3][1])
         return new_line
 
     elif "DECLARE_CRANE_POWERUP" in line_uppercase:
         # DECLARE_CRANE_POWERUP (crane6, gen3, 197, 221, 3)
         cmd = read_line(line, Cmd.OPCODE, Cmd.TWO_PARAMS_XYZ_U8)
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
         new_line = "{} ({}, {}, {}, {}, {})".format(cmd_rot[0], cmd_rot[1], cmd_rot[2], cmd_rot[3][0], cmd_rot[3][1], cmd_rot[3][2])
         return new_line
 
     elif "CONVEYOR" in line_uppercase:
         # CONVEYOR conv1 = (9.50, 77.50, 3.00) (1.00, 13.00) 0 1   xyz/xy width height speed_x speed_y
         cmd = read_line(line, Cmd.OPCODE, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.COORD_XYZ_F, Cmd.WIDTH_HEIGHT, Cmd.PARAM_NUM, Cmd.PARAM_NUM)
-        cmd_rot = rotate_params(cmd, rotation_angle, width_height_tuple_indexes=[3])
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation, width_height_tuple_indexes=[3])
 
         # rotate conveyor speeds
         if rotation_angle == 180:
@@ -686,7 +701,7 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
         if "SWITCH_GENERATOR" in line_uppercase:
             return new_line
         cmd = read_line(line, Cmd.OPCODE, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.COORD_XYZ_F, Cmd.ROTATION, Cmd.PARAM_ENUM, Cmd.PARAM_NUM, Cmd.PARAM_NUM, Cmd.OPT_PARAM_NUM)
-        cmd_rot = rotate_params(cmd, rotation_angle, rotation_param_indexes=[3])
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation, rotation_param_indexes=[3])
 
         if len(cmd_rot) == 7:
             if len(cmd_rot[2]) == 3:
@@ -704,7 +719,7 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
     elif "DESTRUCTOR" in line_uppercase:
         # DESTRUCTOR des1 = (9.50, 83.50, 3.00) (1.00, 1.00)
         cmd = read_line(line, Cmd.OPCODE, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.COORD_XYZ_F, Cmd.WIDTH_HEIGHT)
-        cmd_rot = rotate_params(cmd, rotation_angle, width_height_tuple_indexes=[3])
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation, width_height_tuple_indexes=[3])
 
         if len(cmd_rot[2]) == 3:
             new_line = "{} {} = ({:.2f}, {:.2f}, {:.2f}) ({:.2f}, {:.2f})".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[2][2], cmd_rot[3][0], cmd_rot[3][1])
@@ -716,7 +731,7 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
     elif "CREATE_LIGHT" in line_uppercase:
         # r_h_2_prison_alarm_light_1 = CREATE_LIGHT (29.00, 241.00, 1.00) 7.99 255 (255, 0, 0) 30 100 5
         cmd = read_line(line, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.OPCODE, Cmd.COORD_XYZ_F, Cmd.PARAM_FLOAT, Cmd.PARAM_NUM, Cmd.RGB, Cmd.PARAM_NUM, Cmd.PARAM_NUM, Cmd.PARAM_NUM)
-        cmd_rot = rotate_params(cmd, rotation_angle, blacklist_indexes=[5])
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation, blacklist_indexes=[5])
         new_line = "{} = {} ({:.2f}, {:.2f}, {:.2f}) {} {} ({}, {}, {}) {} {} {}".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[2][2], cmd_rot[3], cmd_rot[4], cmd_rot[5][0], cmd_rot[5][1], cmd_rot[5][2], cmd_rot[6], cmd_rot[7], cmd_rot[8])
         return new_line
 
@@ -727,7 +742,7 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
         if len(line.strip().split(' ')) < 4:    # if not just declaring var
             return new_line
         cmd = read_line(line, Cmd.OPCODE, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.COORD_XYZ_F, Cmd.PARAM_FLOAT, Cmd.PARAM_NUM, Cmd.RGB, Cmd.PARAM_NUM, Cmd.PARAM_NUM, Cmd.PARAM_NUM)
-        cmd_rot = rotate_params(cmd, rotation_angle, blacklist_indexes=[5])
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation, blacklist_indexes=[5])
         new_line = "{} {} = ({:.2f}, {:.2f}, {:.2f}) {} {} ({}, {}, {}) {} {} {}".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[2][2], cmd_rot[3], cmd_rot[4], cmd_rot[5][0], cmd_rot[5][1], cmd_rot[5][2], cmd_rot[6], cmd_rot[7], cmd_rot[8])
         return new_line
 
@@ -736,7 +751,7 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
         # BOTTOM 0 ANY_PLAYER_ONE_CAR CLOSE_WHEN_OPEN_RULE_FAILS 0 FLIP_RIGHT NOT_REVERSED
         cmd = read_line(line, Cmd.OPCODE, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.PARAM_ENUM, Cmd.COORD_XYZ_U8, Cmd.COORD_XYZ_WH_F,
                         Cmd.PARAM_ENUM, Cmd.PARAM_NUM, Cmd.PARAM_ENUM, Cmd.PARAM_ENUM, Cmd.PARAM_NUM, Cmd.PARAM_ENUM, Cmd.PARAM_ENUM, Cmd.OPT_PARAM_ENUM_OR_NUM)
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
 
         old_face = cmd_rot[5]
         new_face = rotate_face(old_face, rotation_angle)
@@ -750,7 +765,7 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
     elif "SET_GANG_INFO" in line_uppercase:
         # SET_GANG_INFO (redngang, 5, PISTOL, MACHINE_GUN, MOLOTOV, 4, 47.50, 49.50, 255.00, 1, PICKUP, 3)
         cmd = read_line(line, Cmd.OPCODE, Cmd.GANG_INFO)
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
         new_line = "{} ({}, {}, {}, {}, {}, {}, {:.2f}, {:.2f}, {:.2f}, {}, {}, {})".format(cmd_rot[0], cmd_rot[1], cmd_rot[2], cmd_rot[3], cmd_rot[4], cmd_rot[5], cmd_rot[6], cmd_rot[7][0], cmd_rot[7][1], cmd_rot[7][2], cmd_rot[8], cmd_rot[9], cmd_rot[10])
 
         return new_line
@@ -758,7 +773,7 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
     elif "CRUSHER" in line_uppercase:
         # CRUSHER crusher1 = (244.50, 243.50)
         cmd = read_line(line, Cmd.OPCODE, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.COORD_XY_F)
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
         new_line = "{} {} = ({:.2f}, {:.2f})".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1])
 
         return new_line
@@ -767,14 +782,14 @@ def rotate_dec_opcode(line: str, rotation_angle: int):
         # THREAD_TRIGGER thr_kill_frenzy_6 = THREAD_WAIT_FOR_CHAR_IN_AREA (p1, 112.50, 241.50, 2.00, 0.50, 0.50, do_kill_frenzy_6:)
         # THREAD_TRIGGER thr_kill_frenzy_6 = THREAD_WAIT_FOR_CHAR_IN_AREA_ANY_MEANS (p1, 112.50, 241.50, 2.00, 0.50, 0.50, do_kill_frenzy_6:)
         cmd = read_line(line, Cmd.OPCODE, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.OPCODE, Cmd.THREAD_AREA_TYPE)
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
         new_line = "{} {} = {} ({}, {:.2f}, {:.2f}, {:.2f}, {:.2f}, {:.2f}, {})".format(cmd_rot[0], cmd_rot[1], cmd_rot[2], cmd_rot[3], cmd_rot[4][0], cmd_rot[4][1], cmd_rot[4][2], cmd_rot[4][3], cmd_rot[4][4], cmd_rot[5])
         return new_line
 
     elif "THREAD_WAIT_FOR_CHAR_IN_BLOCK" in line_uppercase:
         # THREAD_TRIGGER test1 = THREAD_WAIT_FOR_CHAR_IN_BLOCK (p1, 112.50, 241.50, 2.00, do_something:)
         cmd = read_line(line, Cmd.OPCODE, Cmd.VAR_NAME, Cmd.EQUAL, Cmd.OPCODE, Cmd.THREAD_BLOCK_TYPE)
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
         new_line = "{} {} = {} ({}, {:.2f}, {:.2f}, {:.2f}, {})".format(cmd_rot[0], cmd_rot[1], cmd_rot[2], cmd_rot[3], cmd_rot[4][0], cmd_rot[4][1], cmd_rot[4][2], cmd_rot[5])
         return new_line
 
@@ -820,7 +835,7 @@ lines = [
 #    print(new_line)
 
 
-def rotate_exec_opcode(line: str, rotation_angle: int):
+def rotate_exec_opcode(line: str, rotation_angle: int, translation: tuple = NO_TRANSLATION):
 
     new_line = line
     
@@ -831,7 +846,7 @@ def rotate_exec_opcode(line: str, rotation_angle: int):
         cmd = read_line(line, Cmd.OPCODE, Cmd.PARAM_XYZ_F_OR_VAR)
 
         if type(cmd[2]) == tuple:
-            cmd_rot = rotate_params(cmd, rotation_angle)
+            cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
             new_line = "{} ({}, {:.2f}, {:.2f}, {:.2f})".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[2][2])
         
         return new_line
@@ -839,7 +854,7 @@ def rotate_exec_opcode(line: str, rotation_angle: int):
     elif "EXPLODE_WALL" in line_uppercase:
         # EXPLODE_WALL (143.5, 151.5, 2.0) TOP
         cmd = read_line(line, Cmd.OPCODE, Cmd.COORD_XYZ_F, Cmd.PARAM_ENUM)
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
 
         old_face = cmd_rot[2]
         if old_face.upper() not in DOOR_FACES:
@@ -847,7 +862,9 @@ def rotate_exec_opcode(line: str, rotation_angle: int):
             sys.exit(-1)
         index = DOOR_FACES.index(old_face)
 
-        if rotation_angle == 90:
+        if rotation_angle == 0:     # only translated
+            new_array = DOOR_FACES
+        elif rotation_angle == 90:
             new_array = shift_array(DOOR_FACES, 1)
         elif rotation_angle == 180:
             new_array = shift_array(DOOR_FACES, 2)
@@ -871,7 +888,7 @@ def rotate_exec_opcode(line: str, rotation_angle: int):
         
         cmd = read_line(line, Cmd.OPCODE, Cmd.COORD_XYZ_F_OR_VAR)
         if type(cmd[1]) == tuple:
-            cmd_rot = rotate_params(cmd, rotation_angle)
+            cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
             new_line = "{} ({:.2f}, {:.2f}, {:.2f})".format(cmd_rot[0], cmd_rot[1][0], cmd_rot[1][1], cmd_rot[1][2])
 
         return new_line
@@ -890,18 +907,18 @@ def rotate_exec_opcode(line: str, rotation_angle: int):
                 params, pointer = get_info_manually(line, integer_indexes=[3], float_indexes=[4])
                 cmd.extend(params)
 
-                cmd_rot = rotate_params(cmd, rotation_angle, rotation_param_indexes=[4])
+                cmd_rot = rotate_params(cmd, rotation_angle, translation=translation, rotation_param_indexes=[4])
                 new_line = "{} ({}, {}, {}, {}, {})".format(cmd_rot[0], cmd_rot[1], cmd_rot[2], cmd_rot[3], cmd_rot[4], cmd_rot[5])
             else:
                 cmd = read_line(line, Cmd.OPCODE, Cmd.TWO_PARAMS_XYZ_F)
-                cmd_rot = rotate_params(cmd, rotation_angle)
+                cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
                 new_line = "{} ({}, {}, {:.2f}, {:.2f}, {:.2f})".format(cmd_rot[0], cmd_rot[1], cmd_rot[2], cmd_rot[3][0], cmd_rot[3][1], cmd_rot[3][2])
         return new_line
             
 
     elif "ADD_PATROL_POINT" in line_uppercase:
         cmd = read_line(line, Cmd.OPCODE, Cmd.PARAM_XYZ_F)
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
         new_line = "{} ({}, {:.2f}, {:.2f}, {:.2f})".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[2][2])
         return new_line
 
@@ -911,13 +928,13 @@ def rotate_exec_opcode(line: str, rotation_angle: int):
         cmd.append( tuple(params[0:3]) )
         cmd.append(params[-1])
 
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
         new_line = "{} ({}, {}, {}, {})".format(cmd_rot[0], cmd_rot[1][0], cmd_rot[1][1], cmd_rot[1][2], cmd_rot[2])
         return new_line
 
     elif "ADD_NEW_BLOCK" in line_uppercase:
         cmd = read_line(line, Cmd.OPCODE, Cmd.COORD_XYZ_U8)
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
         new_line = "{} ({}, {}, {})".format(cmd_rot[0], cmd_rot[1][0], cmd_rot[1][1], cmd_rot[1][2])
         return new_line
 
@@ -925,7 +942,7 @@ def rotate_exec_opcode(line: str, rotation_angle: int):
         if "SIDE" in line_uppercase:
             # CHANGE_BLOCK SIDE (16, 31, 3) BOTTOM WALL BULLET NOT_FLAT NOT_FLIP 0 142
             cmd = read_line(line, Cmd.OPCODE, Cmd.PARAM_ENUM, Cmd.COORD_XYZ_U8, Cmd.PARAM_ENUM, Cmd.PARAM_ENUM, Cmd.PARAM_ENUM, Cmd.PARAM_ENUM, Cmd.PARAM_ENUM, Cmd.ROTATION, Cmd.PARAM_NUM)
-            cmd_rot = rotate_params(cmd, rotation_angle)
+            cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
             old_face = cmd_rot[3]
             new_face = rotate_face(old_face, rotation_angle)
             cmd_rot[3] = new_face
@@ -934,7 +951,7 @@ def rotate_exec_opcode(line: str, rotation_angle: int):
         elif "LID" in line_uppercase:
             # CHANGE_BLOCK LID (176, 228, 1) NOT_FLAT NOT_FLIP 0 0 978
             cmd = read_line(line, Cmd.OPCODE, Cmd.PARAM_ENUM, Cmd.COORD_XYZ_U8, Cmd.PARAM_ENUM, Cmd.PARAM_ENUM, Cmd.PARAM_NUM, Cmd.ROTATION, Cmd.PARAM_NUM)
-            cmd_rot = rotate_params(cmd, rotation_angle, rotation_param_indexes=[6], reverse_rot_param=True)
+            cmd_rot = rotate_params(cmd, rotation_angle, translation=translation, rotation_param_indexes=[6], reverse_rot_param=True)
             
             # fix flipped lid tiles for 90 and 270 angles
             if rotation_angle == 90 or rotation_angle == 270:
@@ -951,7 +968,7 @@ def rotate_exec_opcode(line: str, rotation_angle: int):
         elif "TYPE" in line_uppercase:
             # CHANGE_BLOCK TYPE (177, 229, 1) FIELD 0
             cmd = read_line(line, Cmd.OPCODE, Cmd.PARAM_ENUM, Cmd.COORD_XYZ_U8, Cmd.PARAM_ENUM, Cmd.PARAM_NUM)
-            cmd_rot = rotate_params(cmd, rotation_angle)
+            cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
             new_line = "{} {} ({}, {}, {}) {} {}".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[2][2], cmd_rot[3], cmd_rot[4])
 
 
@@ -959,7 +976,7 @@ def rotate_exec_opcode(line: str, rotation_angle: int):
 
     elif "SWITCH_ROAD" in line_uppercase:
         cmd = read_line(line, Cmd.OPCODE, Cmd.PARAM_ENUM, Cmd.COORD_XYZ_U8)
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
         new_line = "{} {} ({}, {}, {})".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[2][2])
 
         return new_line
@@ -985,6 +1002,9 @@ def rotate_exec_opcode(line: str, rotation_angle: int):
             minX, minY = minY, MAP_MAX_X - minX - width - 1
             width, height = height, width
 
+        minX += translation[0]
+        minY += translation[1]
+
         maxX = minX + width
         maxY = minY + height
 
@@ -1000,7 +1020,7 @@ def rotate_exec_opcode(line: str, rotation_angle: int):
         cmd.append( tuple(params[1:4]) )
         cmd.append(params[-1])
 
-        cmd_rot = rotate_params(cmd, rotation_angle, rotation_param_indexes=[3])
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation, rotation_param_indexes=[3])
         
         new_line = "{} ({}, {:.2f}, {:.2f}, {:.2f}, {})".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[2][2], cmd_rot[3])
 
@@ -1009,7 +1029,7 @@ def rotate_exec_opcode(line: str, rotation_angle: int):
     elif "PERFORM_SAVE_GAME" in line_uppercase:
         # PERFORM_SAVE_GAME (thr_savepoint_1, 113.00, 123.00, 2.00, 1.00, 1.00)
         cmd = read_line(line, Cmd.OPCODE, Cmd.PARAM_XYZ_WH_F)
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
 
         new_line = "{} ({}, {:.2f}, {:.2f}, {:.2f}, {:.2f}, {:.2f})".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[2][2], cmd_rot[2][3], cmd_rot[2][4])
         
@@ -1018,7 +1038,7 @@ def rotate_exec_opcode(line: str, rotation_angle: int):
     elif "SET_DIR_OF_TV_VANS" in line_uppercase:
         # SET_DIR_OF_TV_VANS (113.00, 123.00)
         cmd = read_line(line, Cmd.OPCODE, Cmd.COORD_XY_F)
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
         new_line = "{} ({:.2f}, {:.2f})".format(cmd_rot[0], cmd_rot[1][0], cmd_rot[1][1])
         return new_line
 
@@ -1056,7 +1076,7 @@ lines2 = [
 #rotate_exec_opcode(line, 0)
 
 
-def rotate_bool_opcode(line: str, rotation_angle: int):
+def rotate_bool_opcode(line: str, rotation_angle: int, translation: tuple = NO_TRANSLATION):
 
     # TODO: remove this; do it before calling this function
     #if not is_bool_opcode_rotatable(line):
@@ -1077,7 +1097,7 @@ def rotate_bool_opcode(line: str, rotation_angle: int):
         # CHECK_CAR_WRECKED_IN_AREA(r_e_1_pickup_car, 48.50, 20.50, 2.00, 3.00, 1.00)
         # IS_CHAR_FIRING_IN_AREA(p1, 45.50, 75.50, 3.00, 1.00, 1.00)
         cmd = read_line(line, Cmd.OPCODE, Cmd.PARAM_XYZ_WH_F)
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
         new_line = "{}({}, {:.2f}, {:.2f}, {:.2f}, {:.2f}, {:.2f})".format(cmd_rot[0], cmd_rot[1], cmd_rot[2][0], cmd_rot[2][1], cmd_rot[2][2], cmd_rot[2][3], cmd_rot[2][4])
 
         return new_line
@@ -1087,7 +1107,7 @@ def rotate_bool_opcode(line: str, rotation_angle: int):
         # IS_CAR_IN_BLOCK(y_m_1_ice_cream_van, 59.50, 9.50, 2.00)
 
         cmd = read_line(line, Cmd.OPCODE, Cmd.PARAM_XYZ_WH_F)
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
 
         params = line[ line.find('(') + 1 : line.find(')') ].split(',')
         if len(params) == 6:
@@ -1099,7 +1119,7 @@ def rotate_bool_opcode(line: str, rotation_angle: int):
     elif "IS_POINT_ONSCREEN" in line_uppercase:
         # IS_POINT_ONSCREEN(44.50, 197.50, 4.00)
         cmd = read_line(line, Cmd.OPCODE, Cmd.COORD_XYZ_F)
-        cmd_rot = rotate_params(cmd, rotation_angle)
+        cmd_rot = rotate_params(cmd, rotation_angle, translation=translation)
         new_line = "{}({:.2f}, {:.2f}, {:.2f})".format(cmd_rot[0], cmd_rot[1][0], cmd_rot[1][1], cmd_rot[1][2])
         #print(cmd)
     return new_line
@@ -1166,12 +1186,12 @@ def get_bool_opcodes_from_line(line):
 
 #print(get_bool_opcodes_from_line(line4))
 
-def rotate_bool_line(line, rotation_angle):
+def rotate_bool_line(line, rotation_angle, translation=NO_TRANSLATION):
     opcodes_in_line = get_bool_opcodes_from_line(line)      # EX:  ["IS_CAR_IN_BLOCK", "IS_CAR_IN_BLOCK", "LOCATE_CHAR_ANY_MEANS"]
     offset = 0
     for opcode in opcodes_in_line:
         left, cmd, right = get_boolean_command_from_line(line, opcode, offset)
-        cmd = rotate_bool_opcode(cmd, rotation_angle)
+        cmd = rotate_bool_opcode(cmd, rotation_angle, translation)
         line = left + cmd + right
         offset = len(left) + len(cmd)
     return line
@@ -3,6 +3,12 @@ import shutil
 import argparse
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import repeat
+
+import gmp_writer
+import gmp_blocks
+import gmp_cache
 
 PROGRAM_NAME = os.path.basename(sys.argv[0])
 ROOT_DIR = Path(__file__).parent
@@ -13,12 +19,17 @@ MAP_WIDTH = 255
 MAP_HEIGHT = 255
 
 BLOCK_INFO_SIZE = 12
+LAYER_INFO_SIZE = 256*256*BLOCK_INFO_SIZE     # one z level of UMAP
 LIGHT_INFO_SIZE = 16
 ZONE_TYPE_COORDS_DATA_SIZE = 5     # not includes the name length neither the name itself
 
 LIGHT_MAX_X = 32767     # 255*128 + 64 - 1, where 64 = max offset
 LIGHT_MAX_Y = 32767     # 255*128 + 64 - 1
 
+OBJECT_INFO_SIZE = 6    # x, y (fix16), rotation (Ang8), object type
+OBJECT_MAX_X = 32767
+OBJECT_MAX_Y = 32767
+
 AIR_TYPE = 0
 ROAD_TYPE = 1
 PAVEMENT_TYPE = 2
@@ -781,31 +792,32 @@ def rotate_slope(block_data, rotation_angle):
     return new_block_data
 
 
+def rotate_block(old_block_data, rotation_angle):
+    """Rotate the tiles, slope and road arrows of a single block"""
+    if (is_empty_block(old_block_data)):
+        return old_block_data
+    
+    # some field blocks can have arrows, which is the case of train railroads
+    if (is_road_field_block(old_block_data)):
+        new_block_data = rotate_road_arrows(old_block_data, rotation_angle)
+    else:
+        new_block_data = old_block_data
+    
+    if block_has_lid(new_block_data):
+        new_block_data = rotate_lid(new_block_data, rotation_angle)
+    new_block_data = rotate_sides(new_block_data, rotation_angle)
+
+    if is_slope(new_block_data):
+        new_block_data = rotate_slope(new_block_data, rotation_angle)
+
+    return new_block_data
+
 def rotate_info(block_info_array, rotation_angle):
     """Rotate tiles, slopes, road arrows, rotate tile rotations etc."""
     for z in range(len(block_info_array)):
         for y in range(len(block_info_array[z])):
             for x in range(len(block_info_array[z][y])):
-
-                old_block_data = block_info_array[z][y][x]
-
-                if (is_empty_block(old_block_data)):
-                    continue
-                
-                # some field blocks can have arrows, which is the case of train railroads
-                if (is_road_field_block(old_block_data)):
-                    new_block_data = rotate_road_arrows(old_block_data, rotation_angle)
-                else:
-                    new_block_data = old_block_data
-                
-                if block_has_lid(new_block_data):
-                    new_block_data = rotate_lid(new_block_data, rotation_angle)
-                new_block_data = rotate_sides(new_block_data, rotation_angle)
-
-                if is_slope(new_block_data):
-                    new_block_data = rotate_slope(new_block_data, rotation_angle)
-
-                block_info_array[z][y][x] = new_block_data
+                block_info_array[z][y][x] = rotate_block(block_info_array[z][y][x], rotation_angle)
 
     return
 
@@ -879,6 +891,89 @@ def rotate_map(output_path, chunk_infos, rotation_angle, block_info_array):
 
     #print(f"Map blocks rotated successfully by {rotation_angle}°")
 
+def get_rotated_layer_indexes(rotation_angle):
+    """Get the block index of the source layer for each block of the rotated layer, 
+    in the same order as 'rotate_map'"""
+    if (rotation_angle == 180):
+        return [ get_umap_block_idx_from_xyz(MAP_WIDTH - x, MAP_HEIGHT - y, 0) for y in range(256) for x in range(256) ]
+    elif (rotation_angle == 90):
+        return [ get_umap_block_idx_from_xyz(y, MAP_HEIGHT - x, 0) for y in range(256) for x in range(256) ]
+    elif (rotation_angle == 270):
+        return [ get_umap_block_idx_from_xyz(MAP_HEIGHT - y, x, 0) for y in range(256) for x in range(256) ]
+    else:
+        print(f"Error: wrong rotation angle: {rotation_angle}")
+        sys.exit(-1)
+
+def rotate_layer(layer_data, rotation_angle):
+    """Rotate a single z level of UMAP (tiles, slopes, road arrows and block positions).
+
+    'layer_data' must have LAYER_INFO_SIZE bytes. Returns the rotated layer as bytes.
+    """
+    rotated_blocks = dict()     # most blocks of a map are repeated, so rotate each one only once
+    blocks = []
+
+    for i in range(0, LAYER_INFO_SIZE, BLOCK_INFO_SIZE):
+        block_data = layer_data[i : i + BLOCK_INFO_SIZE]
+        new_block_data = rotated_blocks.get(block_data)
+        if new_block_data is None:
+            new_block_data = rotate_block(block_data, rotation_angle)
+            rotated_blocks[block_data] = new_block_data
+        blocks.append(new_block_data)
+    
+    return b"".join([ blocks[idx] for idx in get_rotated_layer_indexes(rotation_angle) ])
+
+def get_rotated_square_indexes(rotation_angle, size):
+    """Get the index (y*size + x) of the source block for each block of a rotated square
+    of 'size' x 'size' blocks, same as 'get_rotated_layer_indexes'"""
+    last = size - 1
+    if (rotation_angle == 180):
+        return [ (last - y)*size + last - x for y in range(size) for x in range(size) ]
+    elif (rotation_angle == 90):
+        return [ (last - x)*size + y for y in range(size) for x in range(size) ]
+    elif (rotation_angle == 270):
+        return [ x*size + last - y for y in range(size) for x in range(size) ]
+    else:
+        print(f"Error: wrong rotation angle: {rotation_angle}")
+        sys.exit(-1)
+
+def rotate_region(layer_data, rotation_angle, region):
+    """Rotate only the square region (x0, y0, size) of a z level, the other blocks are kept.
+    Returns the new layer as bytes."""
+    x0, y0, size = region
+    row_size = size*BLOCK_INFO_SIZE
+
+    rotated_blocks = dict()
+    blocks = []
+    for y in range(y0, y0 + size):
+        row_offset = (y*256 + x0)*BLOCK_INFO_SIZE
+        for i in range(row_offset, row_offset + row_size, BLOCK_INFO_SIZE):
+            block_data = layer_data[i : i + BLOCK_INFO_SIZE]
+            new_block_data = rotated_blocks.get(block_data)
+            if new_block_data is None:
+                new_block_data = rotate_block(block_data, rotation_angle)
+                rotated_blocks[block_data] = new_block_data
+            blocks.append(new_block_data)
+
+    square_indexes = get_rotated_square_indexes(rotation_angle, size)
+
+    new_layer_data = bytearray(layer_data)
+    for y in range(size):
+        row_offset = ((y0 + y)*256 + x0)*BLOCK_INFO_SIZE
+        new_layer_data[row_offset : row_offset + row_size] = b"".join([ blocks[idx] for idx in square_indexes[y*size : (y + 1)*size] ])
+
+    return bytes(new_layer_data)
+
+def get_layer_executor(num_workers):
+    """Get a pool to rotate z levels in parallel.
+
+    Threads only run python code in parallel on free-threaded builds, so a 
+    process pool is used when the GIL is enabled.
+    """
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)
+    if is_gil_enabled():
+        return ProcessPoolExecutor(max_workers=num_workers)
+    return ThreadPoolExecutor(max_workers=num_workers)
+
 def get_zones_info_data(gmp_path, chunk_infos):
 
     if chunk_infos["ZONE"][0] is None:
@@ -929,6 +1024,17 @@ def get_light_info_data(gmp_path, chunk_infos):
 
     return lights_data
 
+def get_objects_info_data(gmp_path, chunk_infos):
+
+    if chunk_infos["MOBJ"][0] is None:
+        return None # no objects
+
+    with open(gmp_path, 'rb') as file:
+        file.seek(chunk_infos["MOBJ"][0])
+        mobj_data = file.read(chunk_infos["MOBJ"][1])
+
+    return [ mobj_data[i : i + OBJECT_INFO_SIZE] for i in range(0, len(mobj_data), OBJECT_INFO_SIZE) ]
+
 def rotate_gmp_blocks(output_path, chunk_infos, rotation_angle, block_info_array):
     """Rotate the UMAP info"""
 
@@ -939,17 +1045,99 @@ def rotate_gmp_blocks(output_path, chunk_infos, rotation_angle, block_info_array
     rotate_map(output_path, chunk_infos, rotation_angle, block_info_array)  # Now rotate the map itself
     return
 
-def rotate_light_coordinates(light_data, rotation_angle):
-    light_x = int.from_bytes(light_data[4:6], 'little')   # word
-    light_y = int.from_bytes(light_data[6:8], 'little')   # word
+def rotate_umap_layers_streaming(layers, rotation_angle):
+    """Rotate the UMAP info one z level at a time.
+    
+    Each level is read and rotated only when the output asks for it, so only one 
+    level is kept in memory.
+    """
+    for layer_data in layers:
+        yield rotate_layer(layer_data, rotation_angle)
+
+def rotate_umap_layers_parallel(layers, rotation_angle, num_workers):
+    """Rotate the UMAP info with each z level rotated by a different worker"""
+    layers = list(layers)
+
+    with get_layer_executor(num_workers) as executor:
+        return list(executor.map(rotate_layer, layers, repeat(rotation_angle)))
+
+def rotate_umap_layers_region(layers, rotation_angle, region, levels):
+    """Rotate only the z levels in 'levels' (z0, z1) and, if given, only the square
+    'region' (x0, y0, size) of them. The other levels are kept as they are."""
+    z0, z1 = levels if levels is not None else (0, 7)
+    for z, layer_data in enumerate(layers):
+        if not (z0 <= z <= z1):
+            yield layer_data
+        elif region is None:
+            yield rotate_layer(layer_data, rotation_angle)
+        else:
+            yield rotate_region(layer_data, rotation_angle, region)
+
+def get_region_limits(region, unit):
+    """Get the origin (x, y) and the last coordinate of a square region (x0, y0, size) of
+    the map, in blocks (unit = 1) or in fix16 (unit = 128). The whole map if 'region' is None."""
+    if region is None:
+        return (0, 0, 256*unit - 1)
+    x0, y0, size = region
+    return (x0*unit, y0*unit, size*unit - 1)
+
+def is_point_in_region(x, y, region, unit):
+    origin_x, origin_y, last = get_region_limits(region, unit)
+    return (origin_x <= x <= origin_x + last and origin_y <= y <= origin_y + last)
+
+def is_zone_in_region(zone_data, region):
+    x0, y0, size = region
+    return (x0 <= zone_data[1] and zone_data[1] + zone_data[3] <= x0 + size
+            and y0 <= zone_data[2] and zone_data[2] + zone_data[4] <= y0 + size)
+
+def is_light_in_region(light_data, region):
+    light_x = int.from_bytes(light_data[4:6], 'little')
+    light_y = int.from_bytes(light_data[6:8], 'little')
+    return is_point_in_region(light_x, light_y, region, 128)
+
+def is_light_in_levels(light_data, levels):
+    light_z = int.from_bytes(light_data[8:10], 'little')
+    z0, z1 = levels
+    return (z0*128 <= light_z < (z1 + 1)*128)
+
+def is_object_in_region(object_data, region):
+    object_x = int.from_bytes(object_data[0:2], 'little')
+    object_y = int.from_bytes(object_data[2:4], 'little')
+    return is_point_in_region(object_x, object_y, region, 128)
+
+def is_every_level(levels):
+    """Zones and map objects have no z level: they are only moved when every z level is"""
+    return levels is None or tuple(levels) == (0, 7)
+
+def check_region(region, levels):
+    """Get the error message for a wrong --region/--levels, None if they are right"""
+    if region is not None:
+        x0, y0, size = region
+        if (size < 1 or x0 < 0 or y0 < 0 or x0 + size > 256 or y0 + size > 256):
+            return f"region x = {x0}, y = {y0}, size = {size} out of the map"
+    if levels is not None:
+        z0, z1 = levels
+        if not (0 <= z0 <= z1 < 8):
+            return f"levels {z0} to {z1} out of the map (0 to 7)"
+    return None
+
+def get_rotated_light_xy(light_data, rotation_angle, region=None):
+    origin_x, origin_y, last = get_region_limits(region, 128)     # last = LIGHT_MAX_X for the whole map
+    light_x = int.from_bytes(light_data[4:6], 'little') - origin_x   # word
+    light_y = int.from_bytes(light_data[6:8], 'little') - origin_y   # word
 
     if (rotation_angle == 180):
-        light_x = LIGHT_MAX_X - light_x
-        light_y = LIGHT_MAX_Y - light_y
+        light_x = last - light_x
+        light_y = last - light_y
     elif (rotation_angle == 90):
-        light_x, light_y = LIGHT_MAX_Y - light_y , light_x
+        light_x, light_y = last - light_y , light_x
     elif (rotation_angle == 270):
-        light_x, light_y = light_y , LIGHT_MAX_X - light_x
+        light_x, light_y = light_y , last - light_x
+
+    return (light_x + origin_x, light_y + origin_y)
+
+def rotate_light_coordinates(light_data, rotation_angle, region=None):
+    light_x, light_y = get_rotated_light_xy(light_data, rotation_angle, region)
 
     if (light_x > LIGHT_MAX_X or light_y > LIGHT_MAX_Y):
         print(f"Error: light coordinate overflow: x = {light_x}, y = {light_y}")
@@ -965,9 +1153,10 @@ def rotate_light_coordinates(light_data, rotation_angle):
 
     return new_light_data
 
-def rotate_zone_coordinates(zone_data, rotation_angle):
-    zone_x = zone_data[1]
-    zone_y = zone_data[2]
+def get_rotated_zone_rect(zone_data, rotation_angle, region=None):
+    origin_x, origin_y, last = get_region_limits(region, 1)     # last = MAP_WIDTH for the whole map
+    zone_x = zone_data[1] - origin_x
+    zone_y = zone_data[2] - origin_y
     zone_w = zone_data[3]
     zone_h = zone_data[4]
 
@@ -977,17 +1166,22 @@ def rotate_zone_coordinates(zone_data, rotation_angle):
     #    return zone_data
 
     if (rotation_angle == 180):
-        zone_x = MAP_WIDTH - zone_x - zone_w + 1
-        zone_y = MAP_HEIGHT - zone_y - zone_h + 1
+        zone_x = last - zone_x - zone_w + 1
+        zone_y = last - zone_y - zone_h + 1
     elif (rotation_angle == 90):
-        zone_x, zone_y = MAP_HEIGHT - zone_y - zone_h + 1, zone_x
+        zone_x, zone_y = last - zone_y - zone_h + 1, zone_x
         zone_w, zone_h = zone_h, zone_w
         pass
     elif (rotation_angle == 270):
-        zone_x, zone_y = zone_y, MAP_WIDTH - zone_x - zone_w + 1
+        zone_x, zone_y = zone_y, last - zone_x - zone_w + 1
         zone_w, zone_h = zone_h, zone_w
         pass
 
+    return (zone_x + origin_x, zone_y + origin_y, zone_w, zone_h)
+
+def rotate_zone_coordinates(zone_data, rotation_angle, region=None):
+    zone_x, zone_y, zone_w, zone_h = get_rotated_zone_rect(zone_data, rotation_angle, region)
+
     if (zone_x < 0 or zone_y < 0):
         print(f"Error: negative zone coordinates: x = {zone_x}, y = {zone_y}")
         sys.exit(-1)
@@ -1007,17 +1201,109 @@ def rotate_zone_coordinates(zone_data, rotation_angle):
 
     return new_zone_data
 
-def rotate_light_info(light_info_array, rotation_angle):
+def get_zone_name(zone_data):
+    return zone_data[ZONE_TYPE_COORDS_DATA_SIZE + 1 :].decode('ascii', errors='replace')
+
+def validate_zones_and_lights(zones_info_array, light_info_array, rotation_angle):
+    """Check all rotated zones and lights against the map bounds in one pass.
+
+    Returns a list of error messages (empty if every zone and light fits in the map), 
+    so a bad map can be rejected before any output is written.
+    """
+    errors = []
+
+    if zones_info_array is not None:
+        zone_rects = [ get_rotated_zone_rect(zone_data, rotation_angle) for zone_data in zones_info_array ]
+
+        for i, (x, y, w, h) in enumerate(zone_rects):
+            zone_name = get_zone_name(zones_info_array[i])
+            if (x < 0 or y < 0):
+                errors.append(f"Zone {i} '{zone_name}': negative zone coordinates: x = {x}, y = {y}")
+            elif (x > MAP_WIDTH or y > MAP_HEIGHT):
+                errors.append(f"Zone {i} '{zone_name}': zone coordinates above {MAP_WIDTH}: x = {x}, y = {y}")
+            elif (x + w > MAP_WIDTH + 1 or y + h > MAP_HEIGHT + 1):
+                errors.append(f"Zone {i} '{zone_name}': zone coordinates overflow: x = {x}, y = {y}, w = {w}, h = {h}")
+
+    if light_info_array is not None:
+        light_coords = [ get_rotated_light_xy(light_data, rotation_angle) for light_data in light_info_array ]
+
+        for i, (x, y) in enumerate(light_coords):
+            if (x > LIGHT_MAX_X or y > LIGHT_MAX_Y):
+                errors.append(f"Light {i}: light coordinate overflow: x = {x}, y = {y}")
+            elif (x < 0 or y < 0):
+                errors.append(f"Light {i}: negative light coordinates: x = {x}, y = {y}")
+
+    return errors
+
+def get_rotated_object_xy(object_data, rotation_angle, region=None):
+    origin_x, origin_y, last = get_region_limits(region, 128)     # last = OBJECT_MAX_X for the whole map
+    object_x = int.from_bytes(object_data[0:2], 'little') - origin_x   # fix16
+    object_y = int.from_bytes(object_data[2:4], 'little') - origin_y   # fix16
+
+    if (rotation_angle == 180):
+        object_x = last - object_x
+        object_y = last - object_y
+    elif (rotation_angle == 90):
+        object_x, object_y = last - object_y , object_x
+    elif (rotation_angle == 270):
+        object_x, object_y = object_y , last - object_x
+
+    return (object_x + origin_x, object_y + origin_y)
+
+def rotate_object_data(object_data, rotation_angle, region=None):
+    """Rotate the position and the facing of a map object"""
+    object_x, object_y = get_rotated_object_xy(object_data, rotation_angle, region)
+
+    # Ang8: 256 = 360°, same direction as the rotation parameters of the scripts
+    object_rotation = (object_data[4] - rotation_angle*256//360) % 256
+
+    new_object_data = ( int.to_bytes(object_x, 2, 'little') 
+                        + int.to_bytes(object_y, 2, 'little') 
+                        + bytes([object_rotation]) 
+                        + object_data[5:] )
+    return new_object_data
+
+def validate_objects(objects_info_array, rotation_angle):
+    """Check all rotated map objects against the map bounds, same as 'validate_zones_and_lights'"""
+    errors = []
+
+    if objects_info_array is not None:
+        for i, object_data in enumerate(objects_info_array):
+            x, y = get_rotated_object_xy(object_data, rotation_angle)
+            if (x > OBJECT_MAX_X or y > OBJECT_MAX_Y):
+                errors.append(f"Object {i}: object coordinate overflow: x = {x}, y = {y}")
+            elif (x < 0 or y < 0):
+                errors.append(f"Object {i}: negative object coordinates: x = {x}, y = {y}")
+
+    return errors
+
+def rotate_object_info(objects_info_array, rotation_angle, region=None):
+    """Rotate the map objects, only the ones inside 'region' if given"""
+    for i in range(len(objects_info_array)):
+        if region is not None and not is_object_in_region(objects_info_array[i], region):
+            continue
+        objects_info_array[i] = rotate_object_data(objects_info_array[i], rotation_angle, region)
+    return
+
+def rotate_light_info(light_info_array, rotation_angle, region=None, levels=None):
+    """Rotate the lights, only the ones inside 'region' and 'levels' if given"""
     for i in range(len(light_info_array)):
         old_light_data = light_info_array[i]
-        new_light_data = rotate_light_coordinates(old_light_data, rotation_angle)
+        if region is not None and not is_light_in_region(old_light_data, region):
+            continue
+        if levels is not None and not is_light_in_levels(old_light_data, levels):
+            continue
+        new_light_data = rotate_light_coordinates(old_light_data, rotation_angle, region)
         light_info_array[i] = new_light_data
     return
 
-def rotate_zone_info(zones_info_array, rotation_angle):
+def rotate_zone_info(zones_info_array, rotation_angle, region=None):
+    """Rotate the zones, only the ones fully inside 'region' if given"""
     for i in range(len(zones_info_array)):
         old_zone_data = zones_info_array[i]
-        new_zone_data = rotate_zone_coordinates(old_zone_data, rotation_angle)
+        if region is not None and not is_zone_in_region(old_zone_data, region):
+            continue
+        new_zone_data = rotate_zone_coordinates(old_zone_data, rotation_angle, region)
         zones_info_array[i] = new_zone_data
     return
 
@@ -1073,10 +1359,12 @@ def rotate_gmp_lights(output_path, chunk_infos, rotation_angle, light_info_array
     return
 
 
-def rotate_gmp(gmp_path, chunk_infos, rotation_angle, out_path):
+def rotate_gmp(gmp_path, chunk_infos, rotation_angle, out_path, stream=False, num_workers=1, region=None, levels=None):
 
-    if chunk_infos["UMAP"][0] is None:
-        print("Error: This GMP rotator only support uncompressed maps.")
+    # uncompressed maps (UMAP) are read directly, compressed ones (DMAP, CMAP) are decoded
+    map_chunk = gmp_blocks.get_map_chunk_name(chunk_infos)
+    if map_chunk is None:
+        print("Error: the map has no block data (UMAP, DMAP or CMAP).")
         return -2
         #sys.exit(-1)
 
@@ -1089,27 +1377,88 @@ def rotate_gmp(gmp_path, chunk_infos, rotation_angle, out_path):
     #output_path = ROOT_DIR / f"{filename}_rotated.gmp"
     output_path = out_path / f"{filename}_rotated_{rotation_angle}.gmp"
 
-    print(f"Creating copy of {filename}.gmp")
-    shutil.copyfile(gmp_path, output_path)
+    # check zones, lights and objects before writing anything
+    zones_info_array = get_zones_info_data(gmp_path, chunk_infos)
+    light_info_array = get_light_info_data(gmp_path, chunk_infos)
+    objects_info_array = get_objects_info_data(gmp_path, chunk_infos)
+
+    region_error = check_region(region, levels)
+    if region_error is not None:
+        print(f"Error: {region_error}.")
+        return -1
+
+    if not is_every_level(levels):
+        zones_info_array = None     # kept as they are, see 'is_every_level'
+        objects_info_array = None
+
+    if region is None:
+        errors = validate_zones_and_lights(zones_info_array, light_info_array, rotation_angle)
+        errors += validate_objects(objects_info_array, rotation_angle)
+    else:
+        errors = []     # only what is inside the region is moved, it stays inside
+    if errors:
+        print(f"Error: {len(errors)} zones/lights/objects can't be rotated:")
+        for error in errors:
+            print(f"  {error}")
+        return -3
 
     if rotation_angle == 0:
+        print(f"Creating copy of {filename}.gmp")
+        shutil.copyfile(gmp_path, output_path)
         print("Rotation angle = 0. Finished!")
         return
 
-    # get block infos
-    block_info_array = get_block_info_data(gmp_path, chunk_infos)
-    zones_info_array = get_zones_info_data(gmp_path, chunk_infos)
-    light_info_array = get_light_info_data(gmp_path, chunk_infos)
+    # same map, same rotation and same rotator: the output was already written once
+    cache_key = gmp_cache.get_output_key(gmp_path, ("rotate", rotation_angle, region, levels))
+    if gmp_cache.link_cached_output(cache_key, output_path):
+        print(f"Writing {filename}_rotated_{rotation_angle}.gmp (from cache)")
+        print(f"\nSuccess! GMP rotated by {rotation_angle}° clockwise.")
+        return 0
+
+    new_chunks = dict()
+
+    layers = gmp_blocks.read_umap_layers(gmp_path, chunk_infos)
+    if layers is None:
+        return -1
 
     # rotate map
-    rotate_gmp_blocks(output_path, chunk_infos, rotation_angle, block_info_array)
-    rotate_gmp_zones(output_path, chunk_infos, rotation_angle, zones_info_array)
-    rotate_gmp_lights(output_path, chunk_infos, rotation_angle, light_info_array)
+    if region is not None or levels is not None:
+        print("Rotating UMAP info (region)...")
+        new_chunks[map_chunk] = list(rotate_umap_layers_region(layers, rotation_angle, region, levels))
+    elif num_workers > 1:
+        print(f"Rotating UMAP info ({num_workers} workers)...")
+        new_chunks[map_chunk] = rotate_umap_layers_parallel(layers, rotation_angle, num_workers)
+    elif stream:
+        print("Rotating UMAP info (streaming)...")
+        new_chunks[map_chunk] = rotate_umap_layers_streaming(layers, rotation_angle)
+    else:
+        print("Rotating UMAP info...")
+        new_chunks[map_chunk] = [ rotate_layer(layer_data, rotation_angle) for layer_data in layers ]
+
+    if zones_info_array is not None:
+        print("Rotating zones coordinates...")
+        rotate_zone_info(zones_info_array, rotation_angle, region)
+        new_chunks["ZONE"] = zones_info_array
+
+    if light_info_array is not None:
+        print("Rotating lights coordinates...")
+        rotate_light_info(light_info_array, rotation_angle, region, levels)
+        new_chunks["LGHT"] = light_info_array
+
+    if objects_info_array is not None:
+        print("Rotating objects coordinates...")
+        rotate_object_info(objects_info_array, rotation_angle, region)
+        new_chunks["MOBJ"] = objects_info_array
+
+    # write the rotated chunks, the others are copied from the source file
+    print(f"Writing {filename}_rotated_{rotation_angle}.gmp")
+    # the decoded map is written uncompressed, in place of the compressed chunk
+    renamed_chunks = {map_chunk: "UMAP"}
+    if gmp_writer.write_gmp(gmp_path, output_path, chunk_infos, new_chunks, renamed_chunks) != 0:
+        return -1
+    gmp_cache.add_cached_output(cache_key, output_path)
 
     print(f"\nSuccess! GMP rotated by {rotation_angle}° clockwise.")
-
-    # TODO:  only ste.gmp use MOBJ header, but it can't be decompressed without corrupting gmp
-    #rotate_gmp_objects(output_path, chunk_infos, rotation_angle, obj_info_array)
     return 0
 
 
@@ -1118,6 +1467,10 @@ def main():
     parser = argparse.ArgumentParser(PROGRAM_NAME)
     parser.add_argument("gmp_path")
     parser.add_argument("rot_angle")
+    parser.add_argument("-s", "--stream", action='store_true', help="rotate one z level at a time (low memory)")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="number of z levels rotated in parallel")
+    parser.add_argument("--region", type=int, nargs=3, metavar=("X0", "Y0", "SIZE"), help="rotate only this square of blocks")
+    parser.add_argument("--levels", type=int, nargs=2, metavar=("Z0", "Z1"), help="rotate only the z levels from Z0 to Z1 (the zones and objects are kept as they are, unless from 0 to 7)")
     args = parser.parse_args()
 
     if (not args.gmp_path 
@@ -1140,7 +1493,7 @@ def main():
     out_path = gmp_path.parent
     
     chunk_infos = detect_headers_and_get_chunks(gmp_path)
-    rotate_gmp(gmp_path, chunk_infos, rotation_angle, out_path)
+    rotate_gmp(gmp_path, chunk_infos, rotation_angle, out_path, args.stream, args.jobs, args.region, args.levels)
         
     return
 
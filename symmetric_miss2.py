@@ -0,0 +1,128 @@
+from pathlib import Path
+import argparse
+import sys
+import os
+import re
+
+import rotate_cmd
+import flip_cmd
+import rotate_miss2
+import gmp_engine
+import gmp_symmetric
+
+PROGRAM_NAME = os.path.basename(sys.argv[0])
+ROOT_DIR = Path(__file__).parent
+
+# declarations copied by default: the spawn points of players, cars, objects and weapons
+SPAWN_OPCODES = ["PLAYER_PED", "PARKED_CAR_DATA", "CAR_DATA", "OBJ_DATA", "GENERATOR"]
+
+def get_declaration_regex(opcodes):
+    """Regex of a declaration with coordinates: OPCODE name = (x, y ..."""
+    opcodes = "|".join(sorted(opcodes, key=len, reverse=True))
+    return re.compile(rf"^\s*({opcodes})\s+(\w+)\s*=\s*\(\s*(-?[\d.]+)\s*,\s*(-?[\d.]+)", re.IGNORECASE)
+
+def is_point_in_rect(x, y, rect):
+    rect_x, rect_y, rect_w, rect_h = rect
+    return (rect_x <= x < rect_x + rect_w and rect_y <= y < rect_y + rect_h)
+
+def get_unique_name(var_name, suffix, used_names):
+    new_name = f"{var_name}_{suffix}"
+    i = 2
+    while new_name in used_names:
+        new_name = f"{var_name}_{suffix}_{i}"
+        i += 1
+    used_names.add(new_name)
+    return new_name
+
+def transform_declaration(line, steps):
+    """Apply the rotations/flips of 'steps' to a declaration line (without comment)"""
+    for step_type, value in steps:
+        if step_type == gmp_engine.ROTATE:
+            line = rotate_cmd.rotate_dec_opcode(line, value)
+        else:
+            line = flip_cmd.flip_dec_opcode(line, value)
+    return line.strip()
+
+def replicate_declarations(lines, group_name, source_rect, opcodes=SPAWN_OPCODES):
+    """Add after each declaration of 'opcodes' inside the source rectangle one copy per
+    symmetry of the group, with a new variable name.
+
+    Returns the new lines and the number of declarations copied.
+    """
+    declaration_regex = get_declaration_regex(opcodes)
+    used_names = set(re.findall(r"\w+", "".join(lines)))
+    symmetry_names = gmp_symmetric.GROUPS[group_name][0]
+
+    new_lines = []
+    num_replicated = 0
+    for line in lines:
+        new_lines.append(line)
+
+        comment = rotate_miss2.get_comment(line)
+        code = line[ : line.find("//") ] if comment is not None else line
+        match = declaration_regex.match(code)
+        if match is None:
+            continue
+        if not is_point_in_rect(float(match.group(3)), float(match.group(4)), source_rect):
+            continue
+
+        var_name = match.group(2)
+        tabs_whitespaces = rotate_miss2.get_whitespaces(line)
+        for symmetry_name in symmetry_names:
+            new_code = transform_declaration(code, gmp_engine.SYMMETRIES[symmetry_name])
+            new_name = get_unique_name(var_name, symmetry_name, used_names)
+            new_code = re.sub(rf"\b{var_name}\b", new_name, new_code, count=1)
+            new_lines.append(f"{tabs_whitespaces}{new_code} // {symmetry_name} copy of {var_name}\n")
+        num_replicated += 1
+
+    return new_lines, num_replicated
+
+def main_symmetric_miss(miss2_path, group_name, source_rect, opcodes=SPAWN_OPCODES):
+    filename = gmp_engine.get_filename(miss2_path)
+    output_path = miss2_path.parent / f"{filename}_{group_name}.mis"
+
+    print(f"\nOpening file {filename}.mis: \n")
+    with open(miss2_path, 'r') as file:
+        lines = file.readlines()
+
+    new_lines, num_replicated = replicate_declarations(lines, group_name, source_rect, opcodes)
+
+    with open(output_path, 'w') as file:
+        file.writelines(new_lines)
+
+    num_copies = len(gmp_symmetric.GROUPS[group_name][0])
+    print(f"{num_replicated} declarations copied {num_copies} times.")
+    print(f"Writing {output_path}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(PROGRAM_NAME, description="Copy the spawn points of a script to every part of a symmetric map")
+    parser.add_argument("miss2_path")
+    parser.add_argument("group", help=f"any of {', '.join(gmp_symmetric.GROUPS)}")
+    parser.add_argument("--source", type=int, nargs=4, metavar=("X", "Y", "W", "H"), help="source rectangle of blocks (default: the quadrant/half of the group)")
+    parser.add_argument("--opcodes", nargs='+', default=SPAWN_OPCODES, help=f"declarations to copy (default: {' '.join(SPAWN_OPCODES)})")
+    args = parser.parse_args()
+
+    if args.group not in gmp_symmetric.GROUPS:
+        print(f"Error: unknown group '{args.group}'. Use any of: {', '.join(gmp_symmetric.GROUPS)}")
+        sys.exit(-1)
+
+    if ("\\" not in args.miss2_path and "/" not in args.miss2_path):
+        miss2_path = ROOT_DIR / args.miss2_path
+    else:
+        miss2_path = Path(args.miss2_path)
+
+    if (not miss2_path.exists()):
+        print("File not found.")
+        sys.exit(-1)
+
+    if not str(miss2_path).endswith(".mis"):
+        print(f"The file {miss2_path} isn't a miss2 script file")
+        sys.exit(-1)
+
+    source_rect = tuple(args.source) if args.source else gmp_symmetric.GROUPS[args.group][1]
+    main_symmetric_miss(miss2_path, args.group, source_rect, [ opcode.upper() for opcode in args.opcodes ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+from array import array
+import sys
+
+import rotate_gmp
+import gmp_blocks
+
+BLOCK_INFO_SIZE = gmp_blocks.BLOCK_INFO_SIZE
+LAYER_INFO_SIZE = gmp_blocks.LAYER_INFO_SIZE
+MAP_LEVELS = gmp_blocks.MAP_LEVELS
+
+MAP_WIDTH = rotate_gmp.MAP_WIDTH
+MAP_HEIGHT = rotate_gmp.MAP_HEIGHT
+
+LIGHT_INFO_SIZE = rotate_gmp.LIGHT_INFO_SIZE
+LIGHT_MAX_X = rotate_gmp.LIGHT_MAX_X
+LIGHT_MAX_Y = rotate_gmp.LIGHT_MAX_Y
+LIGHT_MAX_Z = MAP_LEVELS*128 - 1
+
+OBJECT_INFO_SIZE = rotate_gmp.OBJECT_INFO_SIZE
+OBJECT_MAX_X = rotate_gmp.OBJECT_MAX_X
+OBJECT_MAX_Y = rotate_gmp.OBJECT_MAX_Y
+
+# A translation (dx, dy, dz) moves the whole content of the map by a number of blocks.
+# Whatever is moved out of the map would be lost, so everything is checked before: the
+# blocks of a z level at once with their bounding box, the lights and objects with the
+# min/max of their coordinates (taken as word arrays of the whole chunk).
+
+def get_words(data):
+    words = array('H')
+    words.frombytes(data)
+    if sys.byteorder == 'big':
+        words.byteswap()
+    return words
+
+def get_blocks_box(layer_data):
+    """Get the bounding box (x, y, w, h) of the non-empty blocks of a z level, None if
+    the level is empty. The 12 bytes of every block are or-ed together as integers, so
+    each block becomes one byte of a 256*256 grid."""
+    non_empty = 0
+    for i in range(BLOCK_INFO_SIZE):
+        non_empty |= int.from_bytes(layer_data[i::BLOCK_INFO_SIZE], 'little')
+    if non_empty == 0:
+        return None
+
+    grid = non_empty.to_bytes(256*256, 'little')
+    rows = bytes( 1 if grid[y*256 : (y + 1)*256].count(0) != 256 else 0 for y in range(256) )
+    columns = 0
+    for y in range(256):
+        if rows[y]:
+            columns |= int.from_bytes(grid[y*256 : (y + 1)*256], 'little')
+    columns = columns.to_bytes(256, 'little')
+
+    x = 256 - len(columns.lstrip(b'\x00'))
+    y = 256 - len(rows.lstrip(b'\x00'))
+    w = len(columns.rstrip(b'\x00')) - x
+    h = len(rows.rstrip(b'\x00')) - y
+    return (x, y, w, h)
+
+def get_translated_box(box, translation):
+    x, y, w, h = box
+    dx, dy, _ = translation
+    return (x + dx, y + dy, w, h)
+
+def validate_blocks_box(box, z, translation):
+    """Check the bounding box of the blocks of the z level 'z' after the translation.
+
+    Returns an error message, None if every block stays inside the map.
+    """
+    x, y, w, h = get_translated_box(box, translation)
+    new_z = z + translation[2]
+    if (x < 0 or y < 0 or x + w > MAP_WIDTH + 1 or y + h > MAP_HEIGHT + 1):
+        return f"Blocks of z = {z}: moved out of the map: x = {x}, y = {y}, w = {w}, h = {h}"
+    if not (0 <= new_z < MAP_LEVELS):
+        return f"Blocks of z = {z}: moved out of the map: z = {new_z}"
+    return None
+
+def translate_layer(layer_data, dx, dy):
+    """Move the blocks of a z level by (dx, dy), the blocks left behind are empty.
+    Returns the new layer as bytes."""
+    row_size = 256*BLOCK_INFO_SIZE
+    shift = abs(dx)*BLOCK_INFO_SIZE
+    empty_row = bytes(row_size)
+
+    rows = []
+    for y in range(256):
+        source_y = y - dy
+        if not (0 <= source_y < 256):
+            rows.append(empty_row)
+            continue
+        row = layer_data[source_y*row_size : (source_y + 1)*row_size]
+        if dx > 0:
+            rows += [ bytes(shift), row[:row_size - shift] ]
+        elif dx < 0:
+            rows += [ row[shift:], bytes(shift) ]
+        else:
+            rows.append(row)
+
+    return b"".join(rows)
+
+def get_source_level(z, translation):
+    """Get the z level moved to the level 'z', None if it's out of the map"""
+    source_z = z - translation[2]
+    if 0 <= source_z < MAP_LEVELS:
+        return source_z
+    return None
+
+def get_translated_zone_rect(zone_data, translation):
+    dx, dy, _ = translation
+    return (zone_data[1] + dx, zone_data[2] + dy, zone_data[3], zone_data[4])
+
+def translate_zone_coordinates(zone_data, translation):
+    zone_x, zone_y, zone_w, zone_h = get_translated_zone_rect(zone_data, translation)
+
+    new_zone_data = (int.to_bytes(zone_data[0])
+                    + int.to_bytes(zone_x)
+                    + int.to_bytes(zone_y)
+                    + int.to_bytes(zone_w)
+                    + int.to_bytes(zone_h)
+                    + zone_data[5:])
+
+    return new_zone_data
+
+def translate_light_coordinates(light_data, translation):
+    dx, dy, dz = translation
+    light_xyz = get_words(light_data[4:10])
+    light_xyz[0] += dx*128
+    light_xyz[1] += dy*128
+    light_xyz[2] += dz*128
+
+    new_light_data = ( light_data[:4]
+                       + b"".join([ int.to_bytes(word, 2, 'little') for word in light_xyz ])
+                       + light_data[10:] )
+
+    return new_light_data
+
+def translate_object_data(object_data, translation):
+    """Move the position of a map object, its facing doesn't change"""
+    dx, dy, _ = translation
+    object_x = int.from_bytes(object_data[0:2], 'little') + dx*128
+    object_y = int.from_bytes(object_data[2:4], 'little') + dy*128
+
+    new_object_data = ( int.to_bytes(object_x, 2, 'little')
+                        + int.to_bytes(object_y, 2, 'little')
+                        + object_data[4:] )
+
+    return new_object_data
+
+def get_coordinates_out_of_range(words, offset, stride, shift, max_value):
+    """Get the index of the records whose word at 'offset' goes out of 0..max_value when
+    moved by 'shift'. Only the min/max of the words are checked if all of them fit."""
+    column = words[offset::stride]
+    if not column or (min(column) + shift >= 0 and max(column) + shift <= max_value):
+        return []
+    return [ i for i, word in enumerate(column) if not (0 <= word + shift <= max_value) ]
+
+def validate_zones_and_lights(zones_info_array, light_info_array, translation):
+    """Check all translated zones and lights against the map bounds, same as
+    'rotate_gmp.validate_zones_and_lights'"""
+    dx, dy, dz = translation
+    errors = []
+
+    if zones_info_array is not None:
+        for i, zone_data in enumerate(zones_info_array):
+            x, y, w, h = get_translated_zone_rect(zone_data, translation)
+            if (x < 0 or y < 0 or x + w > MAP_WIDTH + 1 or y + h > MAP_HEIGHT + 1):
+                zone_name = rotate_gmp.get_zone_name(zone_data)
+                errors.append(f"Zone {i} '{zone_name}': moved out of the map: x = {x}, y = {y}, w = {w}, h = {h}")
+
+    if light_info_array:
+        words = get_words(b"".join(light_info_array))
+        stride = LIGHT_INFO_SIZE // 2
+        bad_lights = set( get_coordinates_out_of_range(words, 2, stride, dx*128, LIGHT_MAX_X)
+                          + get_coordinates_out_of_range(words, 3, stride, dy*128, LIGHT_MAX_Y)
+                          + get_coordinates_out_of_range(words, 4, stride, dz*128, LIGHT_MAX_Z) )
+        for i in sorted(bad_lights):
+            x, y, z = [ word + shift for word, shift in zip(get_words(light_info_array[i][4:10]), (dx*128, dy*128, dz*128)) ]
+            errors.append(f"Light {i}: moved out of the map: x = {x}, y = {y}, z = {z}")
+
+    return errors
+
+def validate_objects(objects_info_array, translation):
+    """Check all translated map objects against the map bounds"""
+    dx, dy, _ = translation
+    errors = []
+
+    if objects_info_array:
+        words = get_words(b"".join([ object_data[:4] for object_data in objects_info_array ]))
+        bad_objects = set( get_coordinates_out_of_range(words, 0, 2, dx*128, OBJECT_MAX_X)
+                           + get_coordinates_out_of_range(words, 1, 2, dy*128, OBJECT_MAX_Y) )
+        for i in sorted(bad_objects):
+            x = words[2*i] + dx*128
+            y = words[2*i + 1] + dy*128
+            errors.append(f"Object {i}: moved out of the map: x = {x}, y = {y}")
+
+    return errors
+
+def translate_zone_info(zones_info_array, translation):
+    for i in range(len(zones_info_array)):
+        zones_info_array[i] = translate_zone_coordinates(zones_info_array[i], translation)
+    return
+
+def translate_light_info(light_info_array, translation):
+    for i in range(len(light_info_array)):
+        light_info_array[i] = translate_light_coordinates(light_info_array[i], translation)
+    return
+
+def translate_object_info(objects_info_array, translation):
+    for i in range(len(objects_info_array)):
+        objects_info_array[i] = translate_object_data(objects_info_array[i], translation)
+    return